@@ -1,51 +1,16 @@
-import firebase_admin
-from firebase_admin import credentials, db
 from datetime import datetime, timedelta
-# --- SECURE CONFIGURATION BLOCK (for all Python files) ---
-import os
-from dotenv import load_dotenv
-import json
-
-# Load variables from the .env file in the root directory
-load_dotenv()
-
-# Securely load Firebase credentials from the environment variable
-firebase_service_account_json_string = os.getenv('FIREBASE_SERVICE_ACCOUNT_JSON_STRING')
-if not firebase_service_account_json_string:
-    raise ValueError("Firebase credentials are not set in the .env file.")
-
-# Convert the single-line JSON string back into a Python dictionary
-service_account_info = json.loads(firebase_service_account_json_string)
-credential = credentials.Certificate(service_account_info)
-
-# Securely load the database URL
-database_url = os.getenv('FIREBASE_DATABASE_URL')
-if not database_url:
-    raise ValueError("Firebase database URL is not set in the .env file.")
 
+from dashboard_views import push_alert
+from grid_metrics import EnergyTotals
+from profiling import phase
+from reading_schema import parse_batch
+from secure_config import get_reference
 
 # --- 1. CONFIGURATION ---
-
-# --- 2. INITIALIZE FIREBASE ---
-try:
-    app = firebase_admin.initialize_app(
-        credential,
-        {'databaseURL': database_url},
-        name='analyticsApp'
-    )
-    print("   -> Firebase Initialized.")
-except Exception as e:
-    # This can happen if the app is already initialized in another script
-    # running in the same process. We try to get the existing app.
-    if 'has already been initialized' in str(e):
-        print("   -> Firebase app already initialized. Getting existing app.")
-        app = firebase_admin.get_app(name='analyticsApp')
-    else:
-        print(f"   -> CRITICAL ERROR: {e}")
-        exit()
+FIREBASE_APP_NAME = 'analyticsApp'
 
 
-# --- 3. ANALYTICS LOGIC ---
+# --- 2. ANALYTICS LOGIC ---
 def run_analysis():
     """Fetches recent data and performs analysis."""
     print("\n--- Running Analytics Cycle ---")
@@ -53,66 +18,59 @@ def run_analysis():
     # Define the time window for analysis (e.g., last 15 minutes)
     end_time = datetime.now()
     start_time = end_time - timedelta(minutes=1)
-    start_iso = start_time.isoformat()
+    start_ms = int(start_time.timestamp() * 1000)
     
     print(f"Fetching data from the last 15 minutes...")
-    live_data_ref = db.reference('live_data', app=app)
-    recent_data = live_data_ref.order_by_child('timestamp').start_at(start_iso).get()
+    live_data_ref = get_reference('live_data', FIREBASE_APP_NAME)
+    with phase('fetch'):
+        recent_data = live_data_ref.order_by_child('ts_ms').start_at(start_ms).get()
     
     if not recent_data:
         print("No recent data found to analyze. Make sure the simulator is running.")
         return
         
-    data_points = list(recent_data.values())
-    print(f"   -> Found {len(data_points)} data points to analyze.")
-    
-    # Initialize counters
-    total_generated_kw = 0
-    total_consumed_kw = 0
-    overflow_events = 0
-    underflow_events = 0
+    with phase('parse'):
+        readings, malformed = parse_batch(recent_data.values())
+    print(f"   -> Found {len(readings)} data points to analyze ({malformed} malformed skipped).")
 
-    for reading in data_points:
-        total_generated_kw += reading['generation']['total_kw']
-        total_consumed_kw += reading['consumption_kw']
-        
-        # Detect Overflow (wasted energy): Generating more than needed AND the battery is full.
-        is_overflow = (reading['generation']['total_kw'] > reading['consumption_kw'] and 
-                       reading['battery_soc_percent'] >= 99.5)
-        if is_overflow:
-            overflow_events += 1
+    # Overflow (wasted energy): generating more than needed AND the battery is full.
+    # Underflow (power shortage): consuming more than generating AND the battery is empty.
+    with phase('compute'):
+        totals = EnergyTotals().add_chunk(readings)
+    overflow_events = totals.overflow_events
+    underflow_events = totals.underflow_events
 
-        # Detect Underflow (power shortage): Consuming more than generating AND the battery is empty.
-        is_underflow = (reading['consumption_kw'] > reading['generation']['total_kw'] and 
-                        reading['battery_soc_percent'] <= 0.5)
-        if is_underflow:
-            underflow_events += 1
-            
     # Calculate overall "Grid Utilization Efficiency" for the period
     # This metric shows how much of the generated power was directly used by the load.
-    efficiency = (total_consumed_kw / total_generated_kw * 100) if total_generated_kw > 0 else 0
-    
+    total_generated_kwh = totals.total_generated_kwh
+    efficiency = (totals.total_consumed_kwh / total_generated_kwh * 100) if total_generated_kwh > 0 else 0
+
     print("\n--- Analysis Results ---")
     print(f"Grid Utilization Efficiency: {efficiency:.2f}%")
     print(f"Wasted Energy Events (Overflow): {overflow_events}")
     print(f"Power Shortage Events (Underflow): {underflow_events}")
 
     # Log alerts to a new '/alerts' node in Firebase if thresholds are breached
-    alerts_ref = db.reference('alerts', app=app)
     timestamp = datetime.now().isoformat()
     
     # If more than 2 overflow events occurred, log an alert.
     if overflow_events > 2:
         alert_msg = f"High energy overflow detected ({overflow_events} instances in 15 mins)."
         print(f"ALERT: {alert_msg}")
-        alerts_ref.push({'timestamp': timestamp, 'type': 'Overflow', 'message': alert_msg})
+        with phase('write'):
+            push_alert({'timestamp': timestamp, 'type': 'Overflow', 'message': alert_msg}, FIREBASE_APP_NAME)
         
     if underflow_events > 2:
         alert_msg = f"Potential power shortage detected ({underflow_events} instances in 15 mins)."
         print(f"ALERT: {alert_msg}")
-        alerts_ref.push({'timestamp': timestamp, 'type': 'Underflow', 'message': alert_msg})
+        with phase('write'):
+            push_alert({'timestamp': timestamp, 'type': 'Underflow', 'message': alert_msg}, FIREBASE_APP_NAME)
+
+
+# --- 3. RUN THE SCRIPT ---
+def main(args=None):
+    run_analysis()
 
 
-# --- 4. RUN THE SCRIPT ---
 if __name__ == "__main__":
-    run_analysis()
\ No newline at end of file
+    main()
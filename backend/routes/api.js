@@ -38,7 +38,7 @@ const db = firebase.database();
 
 router.get('/latest-data', async (req, res) => {
     try {
-        const snapshot = await db.ref('live_data').orderByChild('timestamp').limitToLast(1).once('value');
+        const snapshot = await db.ref('live_data').orderByChild('ts_ms').limitToLast(1).once('value');
         const data = snapshot.val();
         if (data) {
             const latestKey = Object.keys(data)[0];
@@ -51,9 +51,20 @@ router.get('/latest-data', async (req, res) => {
     }
 });
 
+// Single precomputed document maintained by run_listener.py: latest reading
+// per site, the last 100 readings and running KPIs, plus the efficiency proof,
+// ML forecast and last 50 alerts copied in by their jobs. One read per dashboard load.
+router.get('/dashboard', async (req, res) => {
+    try {
+        const snapshot = await db.ref('dashboard').once('value');
+        if (snapshot.exists()) { res.json(snapshot.val()); }
+        else { res.status(404).json({ message: 'Dashboard view not materialized yet. Start run_listener.py.' }); }
+    } catch (error) { res.status(500).json({ error: error.message }); }
+});
+
 router.get('/historical-data', async (req, res) => {
     try {
-        const snapshot = await db.ref('live_data').orderByChild('timestamp').limitToLast(100).once('value');
+        const snapshot = await db.ref('live_data').orderByChild('ts_ms').limitToLast(100).once('value');
         res.json(Object.values(snapshot.val() || {}));
     } catch (error) { res.status(500).json({ error: error.message }); }
 });
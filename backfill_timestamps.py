@@ -0,0 +1,48 @@
+"""One-off migration: adds the integer 'ts_ms' key to readings stored before
+the listener started stamping it, so ts_ms range queries also see them.
+
+Run it with `python cli.py backfill`. It pages through the history, so it
+is safe to run on a large database, and readings that already have
+'ts_ms' are left untouched.
+"""
+from history_reader import DEFAULT_PAGE_SIZE, fetch_page
+from profiling import phase
+from reading_schema import epoch_ms
+from secure_config import get_reference
+
+FIREBASE_APP_NAME = 'timestampBackfillApp'
+
+
+def backfill_timestamps(page_size=DEFAULT_PAGE_SIZE):
+    print("--- Backfilling epoch-ms timestamps in 'live_data' ---")
+    live_data_ref = get_reference('live_data', FIREBASE_APP_NAME)
+    updated = skipped = 0
+    after_key = None
+    while True:
+        items = fetch_page(live_data_ref, page_size, after_key)
+        if not items:
+            break
+        updates = {}
+        for key, reading in items:
+            if not isinstance(reading, dict) or isinstance(reading.get('ts_ms'), int):
+                continue
+            try:
+                updates[f"{key}/ts_ms"] = epoch_ms(reading['timestamp'])
+            except (KeyError, TypeError, ValueError):
+                skipped += 1
+        if updates:
+            with phase('write'):
+                live_data_ref.update(updates) # One multi-path write per page
+            updated += len(updates)
+        after_key = items[-1][0]
+        if len(items) < page_size:
+            break
+    print(f"   -> {updated} readings updated, {skipped} without a usable timestamp skipped.")
+
+
+def main(args=None):
+    backfill_timestamps(page_size=getattr(args, 'page_size', DEFAULT_PAGE_SIZE))
+
+
+if __name__ == "__main__":
+    main()
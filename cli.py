@@ -0,0 +1,129 @@
+"""Single entry point for every smart grid job.
+
+Usage: python cli.py [--profile [--profile-dir DIR]] <command> [options]
+
+Only the module behind the chosen command is imported, and heavy
+dependencies (pandas, scikit-learn, fpdf, paho-mqtt, firebase_admin) are
+imported inside the functions that use them, so `python cli.py --help`
+and lightweight commands start without loading any of them.
+"""
+import argparse
+import importlib
+import os
+import sys
+
+
+def add_listen_arguments(parser):
+    parser.add_argument('--dashboard-file', help="Also write the materialized dashboard view to this JSON file.")
+    parser.add_argument('--dashboard-interval', type=float, default=2,
+                        help="Minimum seconds between dashboard view writes (default: 2).")
+    parser.add_argument('--broker', default='test.mosquitto.org',
+                        help="MQTT broker to subscribe to (default: test.mosquitto.org).")
+    parser.add_argument('--port', type=int, default=1883, help="MQTT broker port (default: 1883).")
+    parser.add_argument('--topic', default='smartgrid/data', help="Topic to subscribe to (default: smartgrid/data).")
+    parser.add_argument('--live-data-node', default='live_data',
+                        help="Firebase node readings are stored under (default: live_data).")
+    parser.add_argument('--dashboard-node', default='dashboard',
+                        help="Firebase node the dashboard view is written to (default: dashboard).")
+
+
+def add_page_size_argument(parser):
+    parser.add_argument('--page-size', type=int, default=5000,
+                        help="Readings fetched per page while streaming the history (default: 5000).")
+
+
+def add_history_arguments(parser):
+    add_page_size_argument(parser)
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Aggregate daily partitions in this many processes instead of streaming (default: 0, off).")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="With --workers, recompute past days instead of using cached partials.")
+
+
+def add_predict_arguments(parser):
+    parser.add_argument('--select', action='store_true',
+                        help="Run the parallel model-selection backtest instead of the daily forecast.")
+    parser.add_argument('--days', type=int, default=28,
+                        help="Days of history used by --select (default: 28).")
+    parser.add_argument('--jobs', type=int, default=-1,
+                        help="Parallel workers for --select; -1 uses every core (default: -1).")
+
+
+def add_capture_arguments(parser):
+    parser.add_argument('output', help="Capture file to append to (created if missing).")
+    parser.add_argument('--topic', default='smartgrid/data', help="Topic to record (default: smartgrid/data).")
+    parser.add_argument('--duration', type=float, help="Stop after this many seconds (default: until CTRL+C).")
+    parser.add_argument('--broker', default='test.mosquitto.org',
+                        help="MQTT broker to record from (default: test.mosquitto.org).")
+    parser.add_argument('--port', type=int, default=1883, help="MQTT broker port (default: 1883).")
+
+
+def add_replay_arguments(parser):
+    parser.add_argument('capture', help="Capture file to publish.")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Playback speed: 1 = as recorded, N = N times faster, 0 = as fast as possible.")
+    parser.add_argument('--topic', default='smartgrid/replay', help="Topic to publish to (default: smartgrid/replay).")
+    parser.add_argument('--recorded-topic', action='store_true',
+                        help="Publish every message on the topic it was recorded on instead of --topic.")
+    parser.add_argument('--broker', default='localhost', help="MQTT broker to publish to (default: localhost).")
+    parser.add_argument('--port', type=int, default=1883, help="MQTT broker port (default: 1883).")
+
+
+# Options for each command. Commands without an entry take no options.
+ARGUMENTS = {
+    'listen': add_listen_arguments,
+    'efficiency': add_history_arguments,
+    'report': add_history_arguments,
+    'predict': add_predict_arguments,
+    'capture': add_capture_arguments,
+    'replay': add_replay_arguments,
+    'backfill': add_page_size_argument,
+}
+
+# command name -> (module, help text)
+COMMANDS = {
+    'simulate': ('simulator', "Publish simulated microgrid readings to MQTT."),
+    'listen': ('run_listener', "Store MQTT readings in Firebase."),
+    'rules': ('rules_engine', "Watch the latest reading and raise alerts."),
+    'analyze': ('analytics', "Analyze the last few minutes of readings."),
+    'efficiency': ('efficiency_calculator', "Calculate the efficiency proof over all history."),
+    'report': ('report_generator', "Generate the JSON and PDF performance report."),
+    'predict': ('predictions', "Forecast tomorrow's solar generation."),
+    'capture': ('mqtt_capture', "Record the raw MQTT stream to a capture file."),
+    'replay': ('mqtt_capture', "Publish a capture file back to the MQTT broker."),
+    'backfill': ('backfill_timestamps', "Add epoch-ms 'ts_ms' keys to readings stored without one."),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description="Smart grid command line tools.")
+    parser.add_argument('--profile', action='store_true', default=bool(os.getenv('SMARTGRID_PROFILE')),
+                        help="Profile the command. Can also be enabled with SMARTGRID_PROFILE=DIR.")
+    parser.add_argument('--profile-dir', metavar='DIR', default=os.getenv('SMARTGRID_PROFILE') or 'profiles',
+                        help="Directory the profile is written under (default: profiles).")
+    subparsers = parser.add_subparsers(dest='command', metavar='<command>')
+    subparsers.required = True
+    for name, (module_name, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text, description=help_text)
+        subparser.set_defaults(module_name=module_name)
+        if name in ARGUMENTS:
+            ARGUMENTS[name](subparser)
+    return parser
+
+
+def run_command(args):
+    module = importlib.import_module(args.module_name)
+    return module.main(args)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.profile:
+        # Profiling starts before the command module is imported, so import cost shows up too.
+        from profiling import run_profiled
+        return run_profiled(args.command, run_command, args, output_root=args.profile_dir)
+    return run_command(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
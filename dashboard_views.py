@@ -0,0 +1,202 @@
+"""Materialized dashboard views maintained by the listener as it ingests.
+
+Instead of the backend running one query per widget on every refresh, the
+listener keeps a small precomputed document (latest reading per site, a
+fixed-size ring of recent readings and running KPIs) and writes it to the
+'dashboard' node. The batch jobs copy their results next to it (efficiency
+proof, ML forecast, ring of recent alerts), so a dashboard load is a single
+read whose size does not depend on how much history has been stored.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from grid_metrics import interval_hours
+from reading_schema import parse_reading
+from secure_config import get_reference
+
+DASHBOARD_NODE = 'dashboard'
+RECENT_READINGS_LIMIT = 100 # Same window the dashboard chart used to query
+RECENT_ALERTS_LIMIT = 50 # Same window the alerts page used to query
+FORBIDDEN_KEY_CHARACTERS = '.$#[]/'
+
+
+def _as_list(value):
+    # Firebase may hand lists back as dicts keyed by index.
+    if isinstance(value, dict):
+        return [value[key] for key in sorted(value, key=int)]
+    return list(value or [])
+
+
+def publish_to_dashboard(name, value, app_name):
+    """Copies a batch job's result into the dashboard document, next to the listener's view."""
+    get_reference(f"{DASHBOARD_NODE}/{name}", app_name).set(value)
+
+
+def push_alert(alert_data, app_name):
+    """Stores an alert under 'alerts' and in the dashboard's ring of recent alerts."""
+    get_reference('alerts', app_name).push(alert_data)
+    get_reference(f"{DASHBOARD_NODE}/recent_alerts", app_name).transaction(
+        lambda current: (_as_list(current) + [alert_data])[-RECENT_ALERTS_LIMIT:])
+
+
+def site_key(reading):
+    """Returns a Firebase-safe key for the site a Reading came from."""
+    source = reading.source
+    for character in FORBIDDEN_KEY_CHARACTERS:
+        source = source.replace(character, '_')
+    return source
+
+
+class DashboardView:
+    """Latest snapshot per site, recent readings ring and running KPIs."""
+
+    def __init__(self, recent_limit=RECENT_READINGS_LIMIT):
+        self.latest_by_site = {}
+        self.recent_readings = deque(maxlen=recent_limit)
+        self.kpis = {
+            'readings_ingested': 0,
+            'total_generated_kwh': 0.0,
+            'total_consumed_kwh': 0.0,
+            'overflow_events': 0,
+            'underflow_events': 0,
+            'malformed_readings': 0,
+        }
+
+    @classmethod
+    def from_document(cls, document, recent_limit=RECENT_READINGS_LIMIT):
+        """Rebuilds a view from a previously written document (e.g. after a restart)."""
+        view = cls(recent_limit)
+        if not document:
+            return view
+        for site, data in (document.get('latest_by_site') or {}).items():
+            reading = parse_reading(data)
+            if reading is not None:
+                view.latest_by_site[site] = reading
+        recent = _as_list(document.get('recent_readings'))
+        view.recent_readings.extend(reading for reading in map(parse_reading, recent) if reading is not None)
+        for name, value in (document.get('kpis') or {}).items():
+            if name in view.kpis:
+                view.kpis[name] = value
+        return view
+
+    def catch_up(self, stored_readings):
+        """Advances latest_by_site to readings stored after this view was written.
+
+        The document is written at most once per interval, so after a crash it
+        can lag behind 'live_data'; catching up keeps `seq` from being reissued.
+        """
+        for data in stored_readings:
+            reading = parse_reading(data)
+            if reading is None or reading.seq is None:
+                continue
+            site = site_key(reading)
+            latest = self.latest_by_site.get(site)
+            if latest is None or latest.seq is None or reading.seq > latest.seq:
+                self.latest_by_site[site] = reading
+
+    def assign_sequence(self, reading):
+        """Stamps the next per-site sequence number on a reading. The numbering
+        continues across restarts because the latest reading per site is restored
+        (see catch_up)."""
+        previous = self.latest_by_site.get(site_key(reading))
+        reading.seq = previous.seq + 1 if previous is not None and previous.seq is not None else 0
+        return reading
+
+    def ingest(self, reading):
+        """Folds one validated Reading into the view."""
+        site = site_key(reading)
+        previous = self.latest_by_site.get(site)
+        # Energy covers the real time since this site's previous reading.
+        hours = interval_hours(reading.ts_ms, previous.ts_ms if previous is not None else None)
+        self.latest_by_site[site] = reading
+        self.recent_readings.append(reading)
+        generation_kw = reading.total_kw
+        consumption_kw = reading.consumption_kw
+        soc = reading.battery_soc_percent
+
+        kpis = self.kpis
+        kpis['readings_ingested'] += 1
+        kpis['total_generated_kwh'] += generation_kw * hours
+        kpis['total_consumed_kwh'] += consumption_kw * hours
+        if generation_kw > consumption_kw and soc >= 99.5:
+            kpis['overflow_events'] += 1
+        if consumption_kw > generation_kw and soc <= 0.5:
+            kpis['underflow_events'] += 1
+
+    def count_malformed(self):
+        """Records a payload that failed validation at ingest."""
+        self.kpis['malformed_readings'] += 1
+
+    def to_document(self):
+        """Returns the single document the dashboard reads."""
+        kpis = dict(self.kpis)
+        generated = kpis['total_generated_kwh']
+        kpis['grid_utilization_efficiency_percent'] = (
+            round(kpis['total_consumed_kwh'] / generated * 100, 2) if generated > 0 else 0
+        )
+        kpis['total_generated_kwh'] = round(generated, 4)
+        kpis['total_consumed_kwh'] = round(kpis['total_consumed_kwh'], 4)
+        return {
+            'latest': self.recent_readings[-1].to_dict() if self.recent_readings else None,
+            'latest_by_site': {site: reading.to_dict() for site, reading in self.latest_by_site.items()},
+            'recent_readings': [reading.to_dict() for reading in self.recent_readings],
+            'kpis': kpis,
+            'updated_at': datetime.now().isoformat(),
+        }
+
+
+class DashboardWriter:
+    """Writes the view to Firebase and/or a local file, at most once per interval.
+
+    A change that arrives inside the interval is written by a timer when the
+    interval ends, so the document is never more than one interval stale.
+    Callers hold `lock` while they change the view, because the timer writes
+    from its own thread.
+    """
+
+    def __init__(self, view, firebase_ref=None, file_path=None, min_interval_seconds=0):
+        self.view = view
+        self.firebase_ref = firebase_ref
+        self.file_path = file_path
+        self.min_interval_seconds = min_interval_seconds
+        self.lock = threading.RLock()
+        self._last_write = 0.0
+        self._timer = None
+
+    def maybe_write(self):
+        with self.lock:
+            wait = self.min_interval_seconds - (time.monotonic() - self._last_write)
+            if wait > 0:
+                if self._timer is None:
+                    self._timer = threading.Timer(wait, self._flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return False
+            self.write()
+            return True
+
+    def _flush(self):
+        with self.lock:
+            self._timer = None
+            self.write()
+
+    def write(self):
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            document = self.view.to_document()
+            if self.firebase_ref is not None:
+                # update, not set: the batch jobs' results live in the same node.
+                self.firebase_ref.update(document)
+            if self.file_path:
+                # Write to a temporary file first so readers never see a partial document.
+                temp_path = f"{self.file_path}.tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(document, f)
+                os.replace(temp_path, self.file_path)
+            self._last_write = time.monotonic()
@@ -1,70 +1,37 @@
 import datetime
-import os
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, db
-import json
 
-# --- SECURE CONFIGURATION ---
-load_dotenv()
-firebase_service_account_json_string = os.getenv('FIREBASE_SERVICE_ACCOUNT_JSON_STRING')
+from dashboard_views import publish_to_dashboard
+from history_reader import DEFAULT_PAGE_SIZE
+from partitioned_aggregation import compute_totals
+from profiling import phase
+from secure_config import get_reference
 
-if not firebase_service_account_json_string: 
-    raise ValueError("Firebase credentials missing in .env")
-
-service_account_info = json.loads(firebase_service_account_json_string)
-
-credential = credentials.Certificate(service_account_info)
-
-database_url = os.getenv('FIREBASE_DATABASE_URL')
-if not database_url: 
-    raise ValueError("Firebase DB URL missing in .env")
-
-# --- INITIALIZE FIREBASE ---
-try:
-    app = firebase_admin.initialize_app(credential, {'databaseURL': database_url}, name='efficiencyCalculatorApp')
-except ValueError:
-    app = firebase_admin.get_app(name='efficiencyCalculatorApp')
+# --- CONFIGURATION ---
+FIREBASE_APP_NAME = 'efficiencyCalculatorApp'
+OVERFLOW_SOC_PERCENT = 95
 
 # --- THE CORE EFFICIENCY LOGIC ---
-def calculate_efficiency_proof():
+def calculate_efficiency_proof(page_size=DEFAULT_PAGE_SIZE, workers=0, use_cache=True):
     """Analyzes historical data to prove the >15% efficiency improvement."""
     print("--- Starting Efficiency Proof Calculation ---")
 
-    # 1. Fetch all historical data
-    print("   -> Fetching all historical data from 'live_data'...")
-    live_data_ref = db.reference('live_data', app=app)
-    all_data = live_data_ref.get()
+    # 1. Stream the historical data page by page
+    print("   -> Streaming all historical data from 'live_data'...")
+    live_data_ref = get_reference('live_data', FIREBASE_APP_NAME)
+
+    # 2. Calculate baseline totals and identify wasted energy
+    # Wasted energy (overflow) in the "dumb grid" scenario is energy generated
+    # when the battery is full (>=95%) and not being consumed.
+    totals = compute_totals(live_data_ref, OVERFLOW_SOC_PERCENT, page_size, workers, use_cache)
 
-    if not all_data:
+    if totals.readings == 0:
         print("   -> ERROR: No historical data found. Please run the simulator first.")
         return
 
-    print(f"   -> Analyzing {len(all_data)} data points...")
-
-    # 2. Calculate baseline totals and identify wasted energy
-    total_generated_kwh = 0
-    total_consumed_kwh = 0
-    wasted_energy_kwh = 0
-    interval_h = 5 / 3600.0  # Each data point represents 5 seconds
-
-    for key, reading in all_data.items():
-        try:
-            generation_kw = reading['generation']['total_kw']
-            consumption_kw = reading['consumption_kw']
-            
-            # Add to grand totals
-            total_generated_kwh += generation_kw * interval_h
-            total_consumed_kwh += consumption_kw * interval_h
-
-            # Identify wasted energy (overflow) in the "dumb grid" scenario
-            # This is energy generated when the battery is full (>=95%) and not being consumed
-            is_overflow = (reading['battery_soc_percent'] >= 95 and generation_kw > consumption_kw)
-            if is_overflow:
-                excess_kw = generation_kw - consumption_kw
-                wasted_energy_kwh += excess_kw * interval_h
-        except (KeyError, TypeError):
-            continue # Skip any malformed records
+    print(f"   -> Analyzed {totals.readings} data points ({totals.malformed} malformed records skipped).")
+    total_generated_kwh = totals.total_generated_kwh
+    total_consumed_kwh = totals.total_consumed_kwh
+    wasted_energy_kwh = totals.wasted_overflow_kwh
 
     print(f"   -> Total Generated: {total_generated_kwh:.2f} kWh")
     print(f"   -> Total Consumed: {total_consumed_kwh:.2f} kWh")
@@ -102,11 +69,22 @@ def calculate_efficiency_proof():
     print(f"   -> Optimized Efficiency (After System): {proof_data['optimized_efficiency_percent']}%")
     print(f"   -> PROVEN IMPROVEMENT: {proof_data['improvement_percent']}%")
 
-    proof_ref = db.reference('efficiency_proof', app=app)
-    proof_ref.set(proof_data)
+    with phase('write'):
+        proof_ref = get_reference('efficiency_proof', FIREBASE_APP_NAME)
+        proof_ref.set(proof_data)
+        publish_to_dashboard('efficiency_proof', proof_data, FIREBASE_APP_NAME)
     print("\n SUCCESS: Efficiency proof has been saved to Firebase.")
 
 
+def main(args=None):
+    calculate_efficiency_proof(
+        page_size=getattr(args, 'page_size', DEFAULT_PAGE_SIZE),
+        workers=getattr(args, 'workers', 0),
+        use_cache=not getattr(args, 'no_cache', False),
+    )
+
+
 if __name__ == "__main__":
-    calculate_efficiency_proof()
+    main()
+
 
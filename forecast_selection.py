@@ -0,0 +1,180 @@
+"""Model selection for the solar forecast using rolling-origin backtests.
+
+Every (candidate estimator, feature set) pair is trained on the data up to
+a forecast origin and scored on the hours that follow it, for several
+origins spread over the history. Training on the past only avoids the
+leakage of a random train/test split. The backtests run in parallel with
+joblib; each feature matrix is built once and shared by every fold and
+candidate (joblib memory-maps large arrays for the worker processes).
+
+Run it with `python cli.py predict --select`.
+"""
+import json
+import os
+from datetime import datetime
+
+from predictions import FIREBASE_APP_NAME, fetch_training_frame
+from profiling import phase
+from secure_config import get_reference
+
+# --- 1. CONFIGURATION ---
+SELECTION_DATA_DAYS = 28
+BACKTEST_FOLDS = 5
+HORIZONS_HOURS = [1, 6, 24] # MAE is reported over the first N hours after each origin
+MIN_TRAIN_FRACTION = 0.5 # The first origin leaves at least half the history for training
+LEADERBOARD_PATH = 'reports/model_leaderboard.json'
+TARGET = 'solar_kw'
+
+
+def make_candidates():
+    """Returns candidate name -> unfitted estimator."""
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+    from sklearn.linear_model import LinearRegression, Ridge
+    from sklearn.neighbors import KNeighborsRegressor
+
+    return {
+        'linear_regression': LinearRegression(),
+        'ridge': Ridge(alpha=1.0),
+        'knn': KNeighborsRegressor(n_neighbors=25),
+        'random_forest': RandomForestRegressor(n_estimators=100, min_samples_leaf=5, n_jobs=1, random_state=42),
+        'gradient_boosting': GradientBoostingRegressor(random_state=42),
+    }
+
+
+# --- 2. FEATURES ---
+def _calendar_features(df):
+    return df[['hour', 'day_of_week']].to_numpy(dtype=float)
+
+def _cyclic_features(df):
+    import numpy as np
+    hour_of_day = df['timestamp'].dt.hour + df['timestamp'].dt.minute / 60
+    day_angle = 2 * np.pi * hour_of_day.to_numpy() / 24
+    week_angle = 2 * np.pi * df['day_of_week'].to_numpy() / 7
+    return np.column_stack([np.sin(day_angle), np.cos(day_angle), np.sin(week_angle), np.cos(week_angle)])
+
+def _combined_features(df):
+    import numpy as np
+    return np.hstack([_calendar_features(df), _cyclic_features(df)])
+
+FEATURE_SETS = {
+    'calendar': _calendar_features,
+    'cyclic': _cyclic_features,
+    'calendar+cyclic': _combined_features,
+}
+
+
+def build_feature_cache(df):
+    """Builds every feature matrix once so folds and candidates can share it."""
+    return {name: builder(df) for name, builder in FEATURE_SETS.items()}
+
+
+# --- 3. BACKTESTING ---
+def forecast_origins(timestamps_s, max_horizon_s, folds=BACKTEST_FOLDS):
+    """Returns evenly spaced origins that each leave `max_horizon_s` of data after them."""
+    import numpy as np
+    first, last = float(timestamps_s[0]), float(timestamps_s[-1])
+    earliest = first + (last - first) * MIN_TRAIN_FRACTION
+    latest = last - max_horizon_s
+    if latest <= earliest:
+        return []
+    return list(np.linspace(earliest, latest, folds))
+
+def backtest_fold(candidate_name, estimator, feature_set, X, y, timestamps_s, origin_s, horizons_hours):
+    """Fits on readings up to the origin and returns MAE per horizon after it."""
+    import numpy as np
+    from sklearn.base import clone
+    from sklearn.metrics import mean_absolute_error
+
+    train = timestamps_s <= origin_s
+    lead_s = timestamps_s - origin_s
+    test = (lead_s > 0) & (lead_s <= max(horizons_hours) * 3600)
+    if not train.any() or not test.any():
+        return None
+
+    model = clone(estimator).fit(X[train], y[train])
+    predictions = np.clip(model.predict(X[test]), 0, None)
+    test_lead_s = lead_s[test]
+    mae_by_horizon = {}
+    for hours in horizons_hours:
+        within = test_lead_s <= hours * 3600
+        if within.any():
+            mae_by_horizon[f"{hours}h"] = float(mean_absolute_error(y[test][within], predictions[within]))
+    return {'candidate': candidate_name, 'feature_set': feature_set, 'origin_s': origin_s, 'mae': mae_by_horizon}
+
+def rank_results(fold_results, horizons_hours):
+    """Averages fold MAEs per (candidate, feature set) and ranks by the longest horizon."""
+    grouped = {}
+    for result in fold_results:
+        if result is None:
+            continue
+        grouped.setdefault((result['candidate'], result['feature_set']), []).append(result['mae'])
+
+    leaderboard = []
+    for (candidate, feature_set), maes in grouped.items():
+        mean_mae = {}
+        for hours in horizons_hours:
+            values = [mae[f"{hours}h"] for mae in maes if f"{hours}h" in mae]
+            if values:
+                mean_mae[f"{hours}h"] = round(sum(values) / len(values), 4)
+        leaderboard.append({'candidate': candidate, 'feature_set': feature_set,
+                            'folds': len(maes), 'mae_kw': mean_mae})
+
+    ranking_key = f"{max(horizons_hours)}h"
+    leaderboard.sort(key=lambda row: row['mae_kw'].get(ranking_key, float('inf')))
+    for rank, row in enumerate(leaderboard, start=1):
+        row['rank'] = rank
+    return leaderboard
+
+
+# --- 4. MODEL SELECTION SWEEP ---
+def run_model_selection(days=SELECTION_DATA_DAYS, n_jobs=-1, horizons_hours=HORIZONS_HOURS, folds=BACKTEST_FOLDS):
+    """Runs every backtest in parallel and writes the ranked leaderboard."""
+    from joblib import Parallel, delayed
+
+    print(f"\n--- Forecast Model Selection using last {days} days ---")
+    df = fetch_training_frame(days)
+    if df is None:
+        return None
+
+    timestamps_s = df['ts_ms'].to_numpy() // 1000
+    # Only keep horizons the history is long enough to backtest.
+    span_s = timestamps_s[-1] - timestamps_s[0]
+    horizons_hours = [hours for hours in horizons_hours if hours * 3600 * 2 <= span_s]
+    if not horizons_hours:
+        print("Not enough history to backtest even the shortest horizon. Let the simulator run longer.")
+        return None
+    origins = forecast_origins(timestamps_s, max(horizons_hours) * 3600, folds)
+
+    y = df[TARGET].to_numpy(dtype=float)
+    feature_cache = build_feature_cache(df)
+    candidates = make_candidates()
+    tasks = [
+        delayed(backtest_fold)(name, estimator, feature_set, X, y, timestamps_s, origin, horizons_hours)
+        for name, estimator in candidates.items()
+        for feature_set, X in feature_cache.items()
+        for origin in origins
+    ]
+    print(f"Running {len(tasks)} backtests ({len(candidates)} models x {len(feature_cache)} feature sets x {len(origins)} origins)...")
+    with phase('compute'):
+        fold_results = Parallel(n_jobs=n_jobs)(tasks)
+        leaderboard = rank_results(fold_results, horizons_hours)
+
+    print("\n--- MODEL LEADERBOARD (MAE in kW, lower is better) ---")
+    for row in leaderboard:
+        maes = ", ".join(f"{horizon}: {mae:.4f}" for horizon, mae in row['mae_kw'].items())
+        print(f"{row['rank']:>2}. {row['candidate']:<18} {row['feature_set']:<16} {maes}")
+
+    result = {
+        'selection_timestamp': datetime.now().isoformat(),
+        'data_points_used': len(df),
+        'horizons_hours': horizons_hours,
+        'folds': len(origins),
+        'leaderboard': leaderboard,
+    }
+    with phase('write'):
+        os.makedirs(os.path.dirname(LEADERBOARD_PATH), exist_ok=True)
+        with open(LEADERBOARD_PATH, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        get_reference('predictions_ml_leaderboard', FIREBASE_APP_NAME).set(result)
+    print(f"   -> Leaderboard saved to '{LEADERBOARD_PATH}' and Firebase.")
+    return result
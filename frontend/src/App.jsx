@@ -13,6 +13,7 @@ function App() {
     const [predictionData, setPredictionData] = useState(null);
     const [alerts, setAlerts] = useState([]);
     const [efficiencyProof, setEfficiencyProof] = useState(null);
+    const [kpis, setKpis] = useState(null);
     const [loading, setLoading] = useState(true);
     const [isCalculating, setIsCalculating] = useState(false);
     const spokenAlerts = useRef(new Set());
@@ -22,19 +23,16 @@ function App() {
     const fetchData = useCallback(async (isInitialLoad = false) => {
         if (isInitialLoad) setLoading(true);
         try {
-            const [latest, historical, alertData, efficiency, prediction] = await Promise.all([
-                fetch(`${API_BASE_URL}/latest-data`),
-                fetch(`${API_BASE_URL}/historical-data`),
-                fetch(`${API_BASE_URL}/alerts`),
-                fetch(`${API_BASE_URL}/efficiency-proof`),
-                fetch(`${API_BASE_URL}/ml-prediction`)
-            ]);
-            if (latest.ok) setLatestData(await latest.json());
-            if (historical.ok) setHistoricalData(await historical.json());
-            if (efficiency.ok) setEfficiencyProof(await efficiency.json());
-            if (prediction.ok) setPredictionData(await prediction.json());
-            if (alertData.ok) {
-                const newAlerts = await alertData.json().then(data => data.sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp)));
+            // One read: the listener's materialized view plus the results the batch jobs copy into it
+            const dashboard = await fetch(`${API_BASE_URL}/dashboard`);
+            if (dashboard.ok) {
+                const view = await dashboard.json();
+                setLatestData(view.latest);
+                setHistoricalData(view.recent_readings || []);
+                setKpis(view.kpis || null);
+                if (view.efficiency_proof) setEfficiencyProof(view.efficiency_proof);
+                if (view.ml_prediction) setPredictionData(view.ml_prediction);
+                const newAlerts = Object.values(view.recent_alerts || {}).sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
                 setAlerts(newAlerts);
                 newAlerts.forEach(alert => {
                     if (alert.severity === 'CRITICAL' && !spokenAlerts.current.has(alert.timestamp) && 'speechSynthesis' in window) {
@@ -109,6 +107,7 @@ function App() {
                                 historicalData={historicalData}
                                 efficiencyProof={efficiencyProof}
                                 predictionData={predictionData}
+                                kpis={kpis}
                                 onRecalculate={handleRecalculate}
                                 isCalculating={isCalculating}
                             />
@@ -1,6 +1,6 @@
 import React from 'react';
 // CORRECTED: Added .jsx extension to all component imports for clarity
-import { Sun, Wind, BatteryCharging, House } from 'lucide-react';
+import { Sun, Wind, BatteryCharging, House, Zap, Gauge, AlertTriangle } from 'lucide-react';
 import StatCard from '../components/ui/StaticCard.jsx';
 import EfficiencyProofSection from '../components/features/Efficiency.jsx';
 import WhatIfSimulator from '../components/features/WhatIfSimulator.jsx';
@@ -8,7 +8,7 @@ import LiveEnergyFlowChart from '../components/charts/LiveEnergy.jsx';
 import ConsumptionPieChart from '../components/charts/ConsumptionPie.jsx';
 import PredictionChart from '../components/charts/Predictions.jsx';
 
-const DashboardPage = ({ latestData, historicalData, efficiencyProof, onRecalculate, isCalculating,predictionData }) => {
+const DashboardPage = ({ latestData, historicalData, efficiencyProof, onRecalculate, isCalculating,predictionData, kpis }) => {
     return (
         <div className="space-y-6">
             <div className="grid grid-cols-2 lg:grid-cols-2 gap-6">
@@ -21,6 +21,14 @@ const DashboardPage = ({ latestData, historicalData, efficiencyProof, onRecalcul
                 <StatCard title="Live Consumption" value={latestData?.consumption_kw || 0} unit="kW" icon={<House size={24} className="text-white" />} color="bg-green-500" />
                 <StatCard title="Live Battery" value={`${latestData?.battery_soc_percent || 0}%`} unit="" icon={<BatteryCharging size={24} className="text-white" />} color="bg-blue-500" />
             </div>
+            {kpis && (
+                <div className="grid grid-cols-4 md:grid-cols-2 lg:grid-cols-4 gap-6">
+                    <StatCard title="Total Generated" value={kpis.total_generated_kwh} unit="kWh" icon={<Zap size={24} className="text-white" />} color="bg-orange-500" />
+                    <StatCard title="Total Consumed" value={kpis.total_consumed_kwh} unit="kWh" icon={<House size={24} className="text-white" />} color="bg-emerald-500" />
+                    <StatCard title="Grid Utilization" value={`${kpis.grid_utilization_efficiency_percent}%`} unit="" icon={<Gauge size={24} className="text-white" />} color="bg-indigo-500" />
+                    <StatCard title="Overflow / Underflow" value={`${kpis.overflow_events} / ${kpis.underflow_events}`} unit="events" icon={<AlertTriangle size={24} className="text-white" />} color="bg-red-500" />
+                </div>
+            )}
             <div className="grid grid-cols-1 lg:grid-cols-1 gap-6">
                 <div className="lg:col-span-2">
                     <LiveEnergyFlowChart data={historicalData} />
@@ -0,0 +1,141 @@
+"""Energy metrics folded chunk by chunk over the reading history.
+
+Shared by the efficiency calculator and the report generator so that
+both can stream the history instead of loading it all into memory.
+
+Energy is integrated over the real time between readings (from their
+`ts_ms` epoch-ms timestamps): each reading covers the interval since the
+previous reading of the same site, which is the interval the simulator
+integrated its battery state over before publishing. Gaps and faster publish rates
+therefore give correct kWh figures instead of assuming a fixed 5 s step.
+"""
+
+NOMINAL_INTERVAL_S = 5 # Simulator publish interval, used for the first reading of a series
+MAX_INTERVAL_S = 60 # Longer gaps are missing data, not one reading holding for the whole gap
+UNDERFLOW_SOC_PERCENT = 0.5 # Battery is considered empty at or below this
+MS_PER_HOUR = 3600 * 1000
+
+
+def interval_hours(ts_ms, previous_ts_ms=None):
+    """Hours covered by one reading, given the timestamp of the reading before it."""
+    if previous_ts_ms is None:
+        return NOMINAL_INTERVAL_S / 3600
+    return min(max(ts_ms - previous_ts_ms, 0), MAX_INTERVAL_S * 1000) / MS_PER_HOUR
+
+
+class EnergyTotals:
+    """Running totals of generation, consumption, overflow and underflow.
+
+    Intervals are measured per site, from the previous reading of the same
+    source, so interleaved sites each integrate over their own publish
+    interval. Partials computed over consecutive stretches of the history
+    can be combined with merge(), as long as they are merged in time order.
+    """
+
+    def __init__(self, overflow_soc_percent=99.5):
+        # Battery is considered full at or above this, so surplus generation is wasted.
+        self.overflow_soc_percent = overflow_soc_percent
+        self.readings = 0
+        self.malformed = 0
+        self.total_generated_kwh = 0.0
+        self.total_consumed_kwh = 0.0
+        self.wasted_overflow_kwh = 0.0
+        self.overflow_events = 0
+        self.underflow_events = 0
+        self.underflow_seconds = 0.0
+        self.last_ts_ms = {} # Site -> timestamp of its latest reading
+        # Site -> its first reading, which was integrated over the nominal interval
+        # because its predecessor was unknown. merge() corrects it once it is known.
+        self.first_by_site = {}
+
+    def add_chunk(self, chunk):
+        """Folds a HistoryChunk or a reading_dtype() array into the totals."""
+        import numpy as np
+
+        self.malformed += getattr(chunk, 'malformed', 0)
+        generation_kw = chunk['total_kw']
+        if len(generation_kw) == 0:
+            return self
+        ts_ms = chunk['ts_ms']
+        consumption_kw = chunk['consumption_kw']
+        soc = chunk['battery_soc_percent']
+        net_power_kw = generation_kw - consumption_kw
+
+        is_overflow = (net_power_kw > 0) & (soc >= self.overflow_soc_percent)
+        is_underflow = (net_power_kw < 0) & (soc <= UNDERFLOW_SOC_PERCENT)
+
+        # Group rows by site once: a stable sort keeps each site's rows in stream order.
+        sources, site_index = np.unique(chunk['source'], return_inverse=True)
+        order = np.argsort(site_index, kind='stable')
+        sorted_ts_ms = ts_ms[order]
+        starts = np.flatnonzero(np.diff(site_index[order])) + 1
+        ends = np.append(starts, len(order)) - 1
+        starts = np.insert(starts, 0, 0)
+        sites = [source.decode('utf-8', errors='replace') for source in sources]
+
+        # Each reading covers the time since the previous reading of its site; a
+        # site's first row continues from the previous chunk, or gets the nominal interval.
+        previous = np.empty_like(sorted_ts_ms)
+        previous[1:] = sorted_ts_ms[:-1]
+        previous[starts] = [self.last_ts_ms.get(site, int(sorted_ts_ms[start]) - NOMINAL_INTERVAL_S * 1000)
+                            for site, start in zip(sites, starts)]
+        hours = np.empty(len(ts_ms))
+        hours[order] = np.clip(sorted_ts_ms - previous, 0, MAX_INTERVAL_S * 1000) / MS_PER_HOUR
+
+        for site, first, last in zip(sites, order[starts], order[ends]):
+            if site not in self.first_by_site:
+                self.first_by_site[site] = {
+                    'ts_ms': int(ts_ms[first]),
+                    'generation_kw': float(generation_kw[first]),
+                    'consumption_kw': float(consumption_kw[first]),
+                    'overflow_kw': float(net_power_kw[first]) if is_overflow[first] else 0.0,
+                    'is_underflow': bool(is_underflow[first]),
+                }
+            self.last_ts_ms[site] = int(ts_ms[last])
+
+        self.readings += len(generation_kw)
+        self.total_generated_kwh += float((generation_kw * hours).sum())
+        self.total_consumed_kwh += float((consumption_kw * hours).sum())
+        self.wasted_overflow_kwh += float((net_power_kw * hours)[is_overflow].sum())
+        self.overflow_events += int(is_overflow.sum())
+        self.underflow_events += int(is_underflow.sum())
+        self.underflow_seconds += float(hours[is_underflow].sum()) * 3600
+        return self
+
+    def merge(self, other):
+        """Appends the totals of the stretch of history that follows this one."""
+        if other.overflow_soc_percent != self.overflow_soc_percent:
+            raise ValueError("Cannot merge totals computed with different overflow thresholds.")
+        self.readings += other.readings
+        self.malformed += other.malformed
+        self.total_generated_kwh += other.total_generated_kwh
+        self.total_consumed_kwh += other.total_consumed_kwh
+        self.wasted_overflow_kwh += other.wasted_overflow_kwh
+        self.overflow_events += other.overflow_events
+        self.underflow_events += other.underflow_events
+        self.underflow_seconds += other.underflow_seconds
+
+        for site, first in other.first_by_site.items():
+            if site not in self.last_ts_ms:
+                self.first_by_site.setdefault(site, first)
+                continue
+            # The other partial's first reading of this site was integrated over the
+            # nominal interval; now that its predecessor is known, use the real one.
+            correction_h = (interval_hours(first['ts_ms'], self.last_ts_ms[site])
+                            - interval_hours(first['ts_ms']))
+            self.total_generated_kwh += first['generation_kw'] * correction_h
+            self.total_consumed_kwh += first['consumption_kw'] * correction_h
+            self.wasted_overflow_kwh += first['overflow_kw'] * correction_h
+            if first['is_underflow']:
+                self.underflow_seconds += correction_h * 3600
+        self.last_ts_ms.update(other.last_ts_ms)
+        return self
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data):
+        totals = cls(data['overflow_soc_percent'])
+        vars(totals).update(data)
+        return totals
@@ -0,0 +1,115 @@
+"""Constant-memory reader for the full 'live_data' history.
+
+Full-history jobs used to call `live_data_ref.get()`, which materialises
+every reading as nested dicts at once. This reader pages through the
+history in key order with fixed-size queries and yields each page as a
+structured array (see reading_schema), so peak memory depends on the page
+size and not on how long the simulator has been running. The next page is fetched in a
+background thread while the caller folds the current one.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from profiling import phase
+from reading_schema import parse_batch
+
+DEFAULT_PAGE_SIZE = 5000
+
+
+class HistoryChunk:
+    """One page of readings as a reading_dtype() structured array."""
+
+    def __init__(self, readings, last_key, malformed):
+        self.readings = readings
+        self.last_key = last_key
+        self.malformed = malformed # Readings on this page that failed validation
+
+    def __len__(self):
+        return len(self.readings)
+
+    def __getitem__(self, name):
+        return self.readings[name]
+
+
+def fetch_page(ref, page_size, after_key=None):
+    """Returns up to `page_size` (key, reading) pairs that come after `after_key`."""
+    query = ref.order_by_key()
+    with phase('fetch'):
+        if after_key is None:
+            page = query.limit_to_first(page_size).get()
+        else:
+            # start_at is inclusive, so ask for one extra and drop the key we already have.
+            page = query.start_at(after_key).limit_to_first(page_size + 1).get()
+    items = list((page or {}).items())
+    if after_key is not None and items and items[0][0] == after_key:
+        items = items[1:]
+    return items
+
+
+def to_chunk(items):
+    """Validates a page of raw readings into a structured array, skipping malformed rows."""
+    with phase('parse'):
+        readings, malformed = parse_batch(reading for _, reading in items)
+    return HistoryChunk(readings, items[-1][0], malformed)
+
+
+def fetch_range_page(ref, page_size, start_ms, skip_keys=(), end_ms=None):
+    """Returns up to `page_size` (key, reading) pairs with start_ms <= ts_ms <= end_ms,
+    in ts_ms order, leaving out `skip_keys` (readings already read at start_ms)."""
+    query = ref.order_by_child('ts_ms').start_at(start_ms)
+    if end_ms is not None:
+        query = query.end_at(end_ms)
+    with phase('fetch'):
+        page = query.limit_to_first(page_size + len(skip_keys)).get()
+    return [(key, reading) for key, reading in (page or {}).items() if key not in skip_keys]
+
+
+def iter_range_pages(ref, start_ms, page_size=DEFAULT_PAGE_SIZE, end_ms=None):
+    """Yields the raw (key, reading) pages with start_ms <= ts_ms <= end_ms
+    (inclusive, open-ended when end_ms is None), in ts_ms order.
+
+    Pages resume at the last timestamp read. start_at is inclusive and
+    several readings can share a millisecond, so the keys already read at
+    that timestamp are skipped instead of being yielded twice.
+    """
+    skip_keys = set()
+    while True:
+        items = fetch_range_page(ref, page_size, start_ms, skip_keys, end_ms)
+        if not items:
+            return
+        yield items
+        if len(items) < page_size:
+            return
+        last_ts_ms = items[-1][1]['ts_ms']
+        if last_ts_ms != start_ms:
+            skip_keys = set()
+        skip_keys.update(key for key, reading in items if reading.get('ts_ms') == last_ts_ms)
+        start_ms = last_ts_ms
+
+
+def iter_range_chunks(ref, start_ms, page_size=DEFAULT_PAGE_SIZE, end_ms=None):
+    """Yields the pages of iter_range_pages() as HistoryChunk objects."""
+    for items in iter_range_pages(ref, start_ms, page_size, end_ms):
+        yield to_chunk(items)
+
+
+def iter_history_chunks(ref, page_size=DEFAULT_PAGE_SIZE):
+    """Yields the history under `ref` as HistoryChunk objects, in key order.
+
+    While the caller processes one chunk, the next page is already being
+    fetched, so network latency overlaps with computation.
+    """
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        pending = prefetcher.submit(fetch_page, ref, page_size)
+        while True:
+            items = pending.result()
+            if not items:
+                return
+            if len(items) >= page_size:
+                pending = prefetcher.submit(fetch_page, ref, page_size, items[-1][0])
+            else:
+                pending = None
+            chunk = to_chunk(items)
+            del items # Only the column arrays stay alive while the caller folds them
+            yield chunk
+            if pending is None:
+                return
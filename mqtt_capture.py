@@ -0,0 +1,193 @@
+"""Record and replay the raw MQTT stream.
+
+A capture file is append-only and can be memory-mapped for reading:
+
+    header:  8 bytes magic  b'SGCAP001'
+    record:  <Q arrival time (epoch ns)> <H topic length> <I payload length>
+             <topic bytes> <payload bytes>
+
+Records are written as they arrive, so a capture interrupted mid-write
+only loses its last, truncated record, which the reader ignores.
+Replaying a capture publishes the exact same payloads with the recorded
+spacing (1x), N times faster, or as fast as possible, so a traffic
+pattern can be fed deterministically to run_listener.py and
+rules_engine.py. Replays go to a local broker on a separate topic unless
+told otherwise, so a replay never lands in the production stream by
+accident. To feed a replay to the listener without touching production
+history:
+
+    python cli.py listen --broker localhost --topic smartgrid/replay \
+        --live-data-node replay/live_data --dashboard-node replay/dashboard
+    python cli.py replay stream.cap --speed 0
+"""
+import mmap
+import os
+import struct
+import time
+
+from profiling import phase
+from simulator import MQTT_BROKER, MQTT_PORT, MQTT_TOPIC
+
+REPLAY_BROKER = 'localhost'
+REPLAY_TOPIC = 'smartgrid/replay'
+MAGIC = b'SGCAP001'
+RECORD_HEADER = struct.Struct('<QHI')
+
+
+# --- 1. CAPTURE FILE FORMAT ---
+class CaptureWriter:
+    """Appends records to a capture file, writing the header for a new file."""
+
+    def __init__(self, path):
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not is_new:
+            with open(path, 'r+b') as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f"'{path}' is not a smart grid capture file.")
+                # Drop a truncated record left by an interrupted capture before appending.
+                f.truncate(complete_length(path))
+        self.file = open(path, 'ab')
+        if is_new:
+            self.file.write(MAGIC)
+        self.records = 0
+
+    def append(self, topic, payload, arrival_ns=None):
+        if arrival_ns is None:
+            arrival_ns = time.time_ns()
+        topic_bytes = topic.encode('utf-8')
+        self.file.write(RECORD_HEADER.pack(arrival_ns, len(topic_bytes), len(payload)))
+        self.file.write(topic_bytes)
+        self.file.write(payload)
+        self.file.flush()
+        self.records += 1
+
+    def close(self):
+        self.file.close()
+
+
+def complete_length(path):
+    """Returns the size of the capture up to the end of its last complete record."""
+    size = os.path.getsize(path)
+    offset = len(MAGIC)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return offset
+            _, topic_length, payload_length = RECORD_HEADER.unpack(header)
+            record_end = offset + RECORD_HEADER.size + topic_length + payload_length
+            if record_end > size:
+                return offset
+            offset = record_end
+            f.seek(offset)
+
+
+def iter_capture(path):
+    """Yields (arrival_ns, topic, payload) for every complete record in a capture."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size <= len(MAGIC):
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"'{path}' is not a smart grid capture file.")
+            offset = len(MAGIC)
+            end = len(data)
+            while offset + RECORD_HEADER.size <= end:
+                arrival_ns, topic_length, payload_length = RECORD_HEADER.unpack_from(data, offset)
+                offset += RECORD_HEADER.size
+                if offset + topic_length + payload_length > end:
+                    return # Truncated last record from an interrupted capture
+                topic = data[offset:offset + topic_length].decode('utf-8')
+                offset += topic_length
+                payload = data[offset:offset + payload_length]
+                offset += payload_length
+                yield arrival_ns, topic, payload
+
+
+# --- 2. RECORDER ---
+def record_stream(output_path, topic=MQTT_TOPIC, duration_seconds=None, broker=MQTT_BROKER, port=MQTT_PORT):
+    """Subscribes to `topic` and appends every message to `output_path`."""
+    import paho.mqtt.client as mqtt
+
+    writer = CaptureWriter(output_path)
+
+    def on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe(topic)
+            print(f"Recording '{topic}' into '{output_path}'. Press CTRL+C to stop.")
+        else:
+            print(f"   -> ERROR: Failed to connect to MQTT Broker. Code: {rc}")
+
+    def on_message(client, userdata, msg):
+        writer.append(msg.topic, msg.payload)
+
+    client = mqtt.Client()
+    client.on_connect = on_connect
+    client.on_message = on_message
+    try:
+        client.connect(broker, port)
+        client.loop_start()
+        deadline = time.monotonic() + duration_seconds if duration_seconds else None
+        while deadline is None or time.monotonic() < deadline:
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.loop_stop(); client.disconnect()
+        writer.close()
+    print(f"\nCapture stopped: {writer.records} messages recorded.")
+    return writer.records
+
+
+# --- 3. REPLAYER ---
+def replay_capture(path, speed=1.0, topic=REPLAY_TOPIC, broker=REPLAY_BROKER, port=MQTT_PORT):
+    """Publishes a capture to `broker`.
+
+    `speed` scales the recorded spacing (2 = twice as fast); 0 publishes
+    as fast as possible. Messages go to `topic`, or to the topic they were
+    recorded on when `topic` is None.
+    """
+    import paho.mqtt.client as mqtt
+
+    client = mqtt.Client()
+    client.connect(broker, port)
+    client.loop_start()
+
+    published = 0
+    message_info = None
+    first_arrival_ns = None
+    start = time.perf_counter()
+    try:
+        for arrival_ns, recorded_topic, payload in iter_capture(path):
+            if first_arrival_ns is None:
+                first_arrival_ns = arrival_ns
+            if speed > 0:
+                # Schedule against the start time so sleep jitter does not accumulate.
+                due = (arrival_ns - first_arrival_ns) / 1e9 / speed
+                delay = due - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            with phase('write'):
+                message_info = client.publish(topic or recorded_topic, payload)
+            published += 1
+        if message_info is not None:
+            message_info.wait_for_publish(timeout=30) # Let the send queue drain before disconnecting
+    except KeyboardInterrupt:
+        print("\nReplay stopped by user.")
+    finally:
+        client.loop_stop(); client.disconnect()
+
+    elapsed = time.perf_counter() - start
+    rate = published / elapsed if elapsed > 0 else 0
+    print(f"Replayed {published} messages in {elapsed:.2f}s ({rate:.1f} msg/s).")
+    return published
+
+
+def main(args):
+    if args.command == 'capture':
+        record_stream(args.output, topic=args.topic, duration_seconds=args.duration,
+                      broker=args.broker, port=args.port)
+    else:
+        replay_capture(args.capture, speed=args.speed, topic=None if args.recorded_topic else args.topic,
+                       broker=args.broker, port=args.port)
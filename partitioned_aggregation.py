@@ -0,0 +1,154 @@
+"""Partitioned map-reduce aggregation of the reading history.
+
+The history is split into one partition per calendar day. Each day's
+EnergyTotals partial is computed in a process pool and the partials are
+merged in day order: every metric is a sum or a count, plus a correction
+for the interval that spans midnight. Past days never change, so their
+partials are cached on disk (after a grace period for late readings, and
+only while every reading has 'ts_ms') and only days without a cached
+partial are fetched again. Report time then scales down with the number
+of cores and stays small for a long history that has been aggregated
+before.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time, timedelta
+from multiprocessing import get_context
+
+from grid_metrics import EnergyTotals
+from history_reader import DEFAULT_PAGE_SIZE, iter_history_chunks, iter_range_chunks
+from profiling import phase
+from reading_schema import parse_batch
+from secure_config import get_reference
+
+# --- 1. CONFIGURATION ---
+FIREBASE_APP_NAME = 'partitionedAggregationApp'
+PARTIAL_CACHE_DIR = os.path.join('.cache', 'partials')
+PARTIAL_CACHE_VERSION = 5 # Bump whenever EnergyTotals changes so stale partials are ignored
+CACHE_GRACE_HOURS = 6 # A day is cached only this long after midnight, so late readings still land in it
+
+
+# --- 2. PARTITIONS ---
+def _day_start_ms(day):
+    """UTC epoch ms of local midnight at the start of `day`."""
+    return int(datetime.combine(day, time.min).timestamp() * 1000)
+
+def history_days(live_data_ref):
+    """Returns every calendar day between the first and last stored reading."""
+    # Readings without 'ts_ms' sort first; start_at(0) skips them.
+    first = live_data_ref.order_by_child('ts_ms').start_at(0).limit_to_first(1).get()
+    last = live_data_ref.order_by_child('ts_ms').limit_to_last(1).get()
+    if not first or not last:
+        return []
+    first_day = datetime.fromtimestamp(next(iter(first.values()))['ts_ms'] / 1000).date()
+    last_day = datetime.fromtimestamp(next(iter(last.values()))['ts_ms'] / 1000).date()
+    return [first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1)]
+
+def is_cacheable(day, now=None):
+    """A day's partial can be cached once the day ended more than CACHE_GRACE_HOURS ago."""
+    day_end = datetime.combine(day + timedelta(days=1), time.min)
+    return (now or datetime.now()) - day_end >= timedelta(hours=CACHE_GRACE_HOURS)
+
+def unstamped_readings(live_data_ref):
+    """Returns (valid, malformed) counts of readings without 'ts_ms', which no
+    day partition covers. Valid ones only need `python cli.py backfill`."""
+    unstamped = live_data_ref.order_by_child('ts_ms').end_at(-1).get()
+    if not unstamped:
+        return 0, 0
+    readings, malformed = parse_batch(unstamped.values())
+    return len(readings), malformed
+
+def compute_partition(day_iso, overflow_soc_percent, page_size=DEFAULT_PAGE_SIZE):
+    """Map step: aggregates one day of readings. Runs in a worker process.
+
+    The day is read and folded page by page, so a worker's memory depends
+    on the page size and not on how many readings the fleet sent that day.
+    """
+    day = date.fromisoformat(day_iso)
+    live_data_ref = get_reference('live_data', FIREBASE_APP_NAME)
+    totals = EnergyTotals(overflow_soc_percent)
+    # end_at is inclusive, so stop one millisecond before the next midnight.
+    for chunk in iter_range_chunks(live_data_ref, _day_start_ms(day), page_size,
+                                   end_ms=_day_start_ms(day + timedelta(days=1)) - 1):
+        totals.add_chunk(chunk)
+    return day_iso, totals.to_dict()
+
+
+# --- 3. PARTIAL CACHE ---
+def _cache_path(day_iso, overflow_soc_percent):
+    return os.path.join(PARTIAL_CACHE_DIR, f"v{PARTIAL_CACHE_VERSION}", f"soc{overflow_soc_percent:g}", f"{day_iso}.json")
+
+def load_cached_partial(day_iso, overflow_soc_percent):
+    try:
+        with open(_cache_path(day_iso, overflow_soc_percent), encoding='utf-8') as f:
+            return EnergyTotals.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError):
+        return None
+
+def save_cached_partial(day_iso, partial):
+    path = _cache_path(day_iso, partial['overflow_soc_percent'])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(partial, f)
+
+
+# --- 4. MAP-REDUCE ---
+def aggregate_history(overflow_soc_percent=99.5, workers=None, use_cache=True, live_data_ref=None,
+                      page_size=DEFAULT_PAGE_SIZE):
+    """Returns EnergyTotals for the whole history, computed one day per task."""
+    if live_data_ref is None:
+        live_data_ref = get_reference('live_data', FIREBASE_APP_NAME)
+    days = history_days(live_data_ref)
+    unstamped, unstamped_malformed = unstamped_readings(live_data_ref)
+    if unstamped:
+        # Partials computed now would leave these readings out for good once cached.
+        print(f"   -> WARNING: {unstamped} readings have no 'ts_ms' and are left out, and no partials "
+              "are cached. Run `python cli.py backfill` first.")
+    now = datetime.now()
+
+    partials = {}
+    pending_days = []
+    for day in days:
+        cached = load_cached_partial(day.isoformat(), overflow_soc_percent) if use_cache and is_cacheable(day, now) else None
+        if cached is not None:
+            partials[day] = cached
+        else:
+            pending_days.append(day)
+
+    print(f"   -> {len(days)} daily partitions: {len(partials)} cached, {len(pending_days)} to compute.")
+    if pending_days:
+        # 'spawn' gives every worker a fresh Firebase app instead of a forked copy of ours.
+        # Workers are separate processes, so the parent only sees this as one phase.
+        with phase('compute'), ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+            results = pool.map(compute_partition, [day.isoformat() for day in pending_days],
+                               [overflow_soc_percent] * len(pending_days), [page_size] * len(pending_days))
+            for day_iso, partial in results:
+                day = date.fromisoformat(day_iso)
+                if use_cache and not unstamped and is_cacheable(day, now):
+                    save_cached_partial(day_iso, partial)
+                partials[day] = EnergyTotals.from_dict(partial)
+
+    # Reduce in time order so each day's first interval is measured from the previous day's last reading.
+    totals = EnergyTotals(overflow_soc_percent)
+    # Readings backfill could not stamp are malformed, as the streaming path counts them.
+    totals.malformed += unstamped_malformed
+    with phase('compute'):
+        for day in sorted(partials):
+            totals.merge(partials[day])
+    return totals
+
+
+def compute_totals(live_data_ref, overflow_soc_percent=99.5, page_size=DEFAULT_PAGE_SIZE, workers=0, use_cache=True):
+    """Returns EnergyTotals for the whole history under `live_data_ref`.
+
+    Streams it page by page, or with `workers` map-reduces it over daily
+    partitions in a process pool, reusing cached past days.
+    """
+    if workers:
+        return aggregate_history(overflow_soc_percent, workers, use_cache, live_data_ref, page_size)
+    totals = EnergyTotals(overflow_soc_percent)
+    for chunk in iter_history_chunks(live_data_ref, page_size):
+        with phase('compute'):
+            totals.add_chunk(chunk)
+    return totals
@@ -1,97 +1,101 @@
-import firebase_admin
-from firebase_admin import credentials, db
 from datetime import datetime, timedelta
-import pandas as pd
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_error
-import numpy as np
-# --- SECURE CONFIGURATION BLOCK (for all Python files) ---
-import os
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, db
-import json
-
-# Load variables from the .env file in the root directory
-load_dotenv()
-
-# Securely load Firebase credentials from the environment variable
-firebase_service_account_json_string = os.getenv('FIREBASE_SERVICE_ACCOUNT_JSON_STRING')
-if not firebase_service_account_json_string:
-    raise ValueError("Firebase credentials are not set in the .env file.")
-
-# Convert the single-line JSON string back into a Python dictionary
-service_account_info = json.loads(firebase_service_account_json_string)
-credential = credentials.Certificate(service_account_info)
-
-# Securely load the database URL
-database_url = os.getenv('FIREBASE_DATABASE_URL')
-if not database_url:
-    raise ValueError("Firebase database URL is not set in the .env file.")
 
+from dashboard_views import publish_to_dashboard
+from history_reader import iter_range_chunks
+from profiling import phase
+from reading_schema import reading_dtype
+from secure_config import get_reference
 
+# --- 1. CONFIGURATION ---
+FIREBASE_APP_NAME = 'predictionMLApp'
 TRAINING_DATA_DAYS = 7
 
-# --- 2. INITIALIZE FIREBASE ---
-try:
-    print("Initializing Firebase for ML Prediction...")
-    app = firebase_admin.initialize_app(
-        credential,
-        {'databaseURL': database_url},
-        name='predictionMLApp'
-    )
-    print("   -> Firebase Initialized.")
-except Exception as e:
-    if 'has already been initialized' in str(e):
-        app = firebase_admin.get_app(name='predictionMLApp')
-    else:
-        print(f"   -> CRITICAL ERROR: {e}")
-        exit()
+# --- 2. DATA PREPARATION ---
+def local_wall_time(ts_ms):
+    """Converts a Series of epoch ms to naive local wall time.
 
-# --- 3. MACHINE LEARNING PREDICTION & EVALUATION LOGIC ---
-def predict_and_evaluate():
-    print(f"\n--- ML Prediction & Evaluation using last {TRAINING_DATA_DAYS} days ---")
+    The system zone's UTC offset is looked up per hour (DST changes fall on
+    hour boundaries), so a DST change inside the window does not shift the
+    hour feature of the readings on the other side of it.
+    """
+    import pandas as pd
+
+    hours = ts_ms // 3_600_000
+    offsets_ms = {hour: int(datetime.fromtimestamp(hour * 3600).astimezone().utcoffset().total_seconds() * 1000)
+                  for hour in hours.unique()}
+    return pd.to_datetime(ts_ms + hours.map(offsets_ms), unit='ms')
+
+def fetch_training_frame(days=TRAINING_DATA_DAYS, min_points=50):
+    """Fetches the last `days` of readings as a DataFrame sorted by time,
+    or returns None when there is not enough data.
+
+    The range is read page by page into structured arrays, so weeks of
+    history never exist as nested dicts all at once."""
+    import numpy as np
+    import pandas as pd
 
-    # A. Fetch and prepare data (same as before)
-    # ... (Fetching and data preparation code is identical to the previous script)
     end_date = datetime.now()
-    start_date = end_date - timedelta(days=TRAINING_DATA_DAYS)
-    start_iso = start_date.isoformat()
+    start_date = end_date - timedelta(days=days)
+    start_ms = int(start_date.timestamp() * 1000)
     print(f"Fetching data since {start_date.strftime('%Y-%m-%d')}...")
-    live_data_ref = db.reference('live_data', app=app)
-    historical_data = live_data_ref.order_by_child('timestamp').start_at(start_iso).get()
-    
-    if not historical_data or len(historical_data) < 50: # Increased threshold for a proper test
+    live_data_ref = get_reference('live_data', FIREBASE_APP_NAME)
+    chunks = list(iter_range_chunks(live_data_ref, start_ms))
+    readings = np.concatenate([chunk.readings for chunk in chunks]) if chunks else np.empty(0, reading_dtype())
+    malformed = sum(chunk.malformed for chunk in chunks)
+    del chunks
+
+    print(f"   -> Found {len(readings)} data points ({malformed} malformed skipped).")
+    # Counted after validation: malformed rows must not make a tiny frame look big enough.
+    if len(readings) < min_points: # Increased threshold for a proper test
         print("Not enough historical data to evaluate. Let the simulator run longer.")
+        return None
+
+    with phase('parse'):
+        print("Preparing data and creating features...")
+        df = pd.DataFrame(readings).sort_values('ts_ms').reset_index(drop=True)
+        # Solar output follows the local clock, so features use local wall time.
+        df['timestamp'] = local_wall_time(df['ts_ms'])
+        df['hour'] = df['timestamp'].dt.hour
+        df['day_of_week'] = df['timestamp'].dt.dayofweek
+    return df
+
+# --- 3. MACHINE LEARNING PREDICTION & EVALUATION LOGIC ---
+def predict_and_evaluate():
+    # Heavy ML dependencies are only imported when a prediction is requested.
+    import numpy as np
+    import pandas as pd
+    from sklearn.linear_model import LinearRegression
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import mean_absolute_error
+
+    print(f"\n--- ML Prediction & Evaluation using last {TRAINING_DATA_DAYS} days ---")
+
+    # A. Fetch and prepare data
+    df = fetch_training_frame(TRAINING_DATA_DAYS)
+    if df is None:
         return
 
-    print(f"   -> Found {len(historical_data)} data points.")
-    print("Preparing data and creating features...")
-    df = pd.DataFrame.from_dict(historical_data, orient='index')
-    df['solar_kw'] = df['generation'].apply(lambda x: x.get('solar_kw', 0))
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['hour'] = df['timestamp'].dt.hour
-    df['day_of_week'] = df['timestamp'].dt.dayofweek
-    
     features = ['hour', 'day_of_week']
     target = 'solar_kw'
     X = df[features]
     y = df[target]
 
-    # B. NEW: Split Data into Training and Testing sets
-    print("Splitting data into training and testing sets (80/20 split)...")
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # B. Split Data into Training and Testing sets
+    # The split is chronological: shuffling would let the model train on the future.
+    print("Splitting data into training and testing sets (80/20 chronological split)...")
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
     
     # C. Train the Model on the Training Data ONLY
     print("Training the model...")
-    model = LinearRegression()
-    model.fit(X_train, y_train)
+    with phase('compute'):
+        model = LinearRegression()
+        model.fit(X_train, y_train)
     
     # D. NEW: Evaluate the Model on the Unseen Testing Data
     print("Evaluating model performance on the test set...")
-    predictions_on_test_data = model.predict(X_test)
-    mae = mean_absolute_error(y_test, predictions_on_test_data)
+    with phase('compute'):
+        predictions_on_test_data = model.predict(X_test)
+        mae = mean_absolute_error(y_test, predictions_on_test_data)
     
     print("\n--- MODEL RELIABILITY REPORT ---")
     print(f"📊 Mean Absolute Error (MAE): {mae:.4f} kW")
@@ -100,13 +104,15 @@ def predict_and_evaluate():
     
     # E. Retrain the model on ALL data before making a final forecast
     print("\nRetraining model on all available data for final forecast...")
-    model.fit(X, y) # Retrain on the full dataset
+    with phase('compute'):
+        model.fit(X, y) # Retrain on the full dataset
     
     # F. Make Predictions for Tomorrow (same as before)
     print("Making predictions for tomorrow...")
     tomorrow = datetime.now() + timedelta(days=1)
     future_data = pd.DataFrame({'hour': range(24), 'day_of_week': tomorrow.weekday()})
-    hourly_predictions_kw = np.clip(model.predict(future_data), 0, None)
+    with phase('compute'):
+        hourly_predictions_kw = np.clip(model.predict(future_data), 0, None)
     total_predicted_kwh = np.sum(hourly_predictions_kw)
 
     print("\n--- ML Prediction Result ---")
@@ -114,7 +120,7 @@ def predict_and_evaluate():
 
     # G. Save results to Firebase
     hourly_forecast = {f"{hour:02d}:00": round(power, 2) for hour, power in enumerate(hourly_predictions_kw)}
-    prediction_ref = db.reference('predictions_ml', app=app)
+    prediction_ref = get_reference('predictions_ml', FIREBASE_APP_NAME)
     prediction_data = {
         'prediction_timestamp': datetime.now().isoformat(),
         'predicted_total_kwh': round(total_predicted_kwh, 2),
@@ -124,9 +130,19 @@ def predict_and_evaluate():
             'data_points_used': len(df)
         }
     }
-    prediction_ref.set(prediction_data)
+    with phase('write'):
+        prediction_ref.set(prediction_data)
+        publish_to_dashboard('ml_prediction', prediction_data, FIREBASE_APP_NAME)
     print("   -> Detailed forecast and reliability report saved to Firebase.")
 
 # --- 4. RUN THE SCRIPT ---
+def main(args=None):
+    if getattr(args, 'select', False):
+        from forecast_selection import run_model_selection
+        run_model_selection(days=args.days, n_jobs=args.jobs)
+    else:
+        predict_and_evaluate()
+
+
 if __name__ == "__main__":
-    predict_and_evaluate()
\ No newline at end of file
+    main()
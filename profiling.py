@@ -0,0 +1,203 @@
+"""Built-in profiling mode for every command.
+
+`python cli.py --profile [--profile-dir DIR] <command>` (or
+SMARTGRID_PROFILE=DIR in the environment) runs the command under a
+profiling session and, when it finishes or is stopped with CTRL+C or
+SIGTERM, writes a timestamped directory:
+
+    profiles/<command>-<YYYYmmdd-HHMMSS>/
+        cprofile.pstats    cProfile stats of the main thread (snakeviz, pstats)
+        cprofile.txt       the same, top functions by cumulative time
+        stacks.folded      sampled stacks of all threads in collapsed format,
+                           ready for flamegraph.pl or speedscope
+        tracemalloc.txt    top allocations by source line at the phase boundary
+                           with the most traced memory, plus the peak
+        phases.json        wall time per phase (fetch, parse, compute, write)
+
+Jobs mark their phases with `with phase('fetch'):`. When no session is
+running, phase() returns a shared no-op context manager, so the
+instrumentation costs one function call and nothing is imported.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+DEFAULT_OUTPUT_ROOT = 'profiles'
+SAMPLE_INTERVAL_SECONDS = 0.005
+TOP_ALLOCATIONS = 25
+SNAPSHOT_GROWTH = 1.05 # Re-snapshot only when traced memory grew by at least 5%
+
+_session = None
+
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    def __init__(self, session, name):
+        self.session = session
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.session.record_phase(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def phase(name):
+    """Times a block as one phase of the running job when profiling is on."""
+    if _session is None:
+        return _NULL_PHASE
+    return _Phase(_session, name)
+
+
+class ProfileSession:
+    """cProfile, tracemalloc, a stack sampler and phase timings for one run."""
+
+    def __init__(self, name, output_root=DEFAULT_OUTPUT_ROOT, sample_interval=SAMPLE_INTERVAL_SECONDS):
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        self.output_dir = os.path.join(output_root, f"{name}-{stamp}")
+        self.sample_interval = sample_interval
+        self.phases = {}
+        self.stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop_sampling = threading.Event()
+        self._snapshot = None
+        self._snapshot_bytes = 0
+        self._snapshot_phase = None
+
+    def record_phase(self, name, seconds):
+        with self._lock:
+            total, count = self.phases.get(name, (0.0, 0))
+            self.phases[name] = (total + seconds, count + 1)
+            self._snapshot_if_highest(name)
+
+    def _snapshot_if_highest(self, phase_name):
+        # What is alive at exit says little about the peak, so keep the snapshot
+        # taken at the phase boundary with the most traced memory instead.
+        import tracemalloc
+
+        current_bytes, _ = tracemalloc.get_traced_memory()
+        if current_bytes > self._snapshot_bytes * SNAPSHOT_GROWTH:
+            self._snapshot = tracemalloc.take_snapshot()
+            self._snapshot_bytes = current_bytes
+            self._snapshot_phase = phase_name
+
+    def start(self):
+        import cProfile
+        import tracemalloc
+
+        global _session
+        tracemalloc.start()
+        self.profiler = cProfile.Profile()
+        self._sampler = threading.Thread(target=self._sample, name='profiling-sampler', daemon=True)
+        self._sampler.start()
+        self.started_at = time.perf_counter()
+        _session = self
+        self.profiler.enable()
+
+    def stop(self):
+        import tracemalloc
+
+        global _session
+        self.profiler.disable()
+        _session = None
+        wall_seconds = time.perf_counter() - self.started_at
+        self._stop_sampling.set()
+        self._sampler.join()
+        with self._lock:
+            self._snapshot_if_highest('exit')
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self._write(peak_bytes, wall_seconds)
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop_sampling.wait(self.sample_interval):
+            frames = sys._current_frames()
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def _write(self, peak_bytes, wall_seconds):
+        import json
+        import pstats
+        import tracemalloc
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.profiler.dump_stats(os.path.join(self.output_dir, 'cprofile.pstats'))
+        with open(os.path.join(self.output_dir, 'cprofile.txt'), 'w', encoding='utf-8') as f:
+            pstats.Stats(self.profiler, stream=f).sort_stats('cumulative').print_stats(40)
+
+        with open(os.path.join(self.output_dir, 'stacks.folded'), 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        with open(os.path.join(self.output_dir, 'tracemalloc.txt'), 'w', encoding='utf-8') as f:
+            f.write(f"Peak traced memory: {peak_bytes / 1024 / 1024:.2f} MiB\n")
+            f.write(f"Snapshot taken at the end of a '{self._snapshot_phase}' phase, "
+                    f"with {self._snapshot_bytes / 1024 / 1024:.2f} MiB traced.\n\n")
+            snapshot = self._snapshot.filter_traces([
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ])
+            f.write(f"Top {TOP_ALLOCATIONS} allocations at that point, by source line:\n")
+            for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+                f.write(f"{stat}\n")
+
+        phases = {name: {'seconds': round(total, 6), 'count': count}
+                  for name, (total, count) in sorted(self.phases.items())}
+        with open(os.path.join(self.output_dir, 'phases.json'), 'w', encoding='utf-8') as f:
+            json.dump({'wall_seconds': round(wall_seconds, 6), 'phases': phases}, f, indent=2)
+        print(f"Profile written to '{self.output_dir}'.", file=sys.stderr)
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt(f"stopped by signal {signum}")
+
+
+def run_profiled(name, function, *args, output_root=DEFAULT_OUTPUT_ROOT):
+    """Runs function(*args) under a ProfileSession and returns its result.
+
+    Production runs are stopped with SIGTERM, which would skip `finally`, so
+    for the duration of the session it is turned into a KeyboardInterrupt:
+    the job's own CTRL+C cleanup runs and the profile is still written.
+    """
+    import signal
+
+    in_main_thread = threading.current_thread() is threading.main_thread()
+    if in_main_thread:
+        previous_handler = signal.signal(signal.SIGTERM, _interrupt)
+    session = ProfileSession(name, output_root)
+    session.start()
+    try:
+        return function(*args)
+    finally:
+        session.stop()
+        if in_main_thread:
+            signal.signal(signal.SIGTERM, previous_handler)
@@ -0,0 +1,175 @@
+"""The single schema for a microgrid reading.
+
+Readings arrive as nested JSON dicts ("generation": {...}, "grid_status":
+{...}). They are validated once, at ingest, into either a `Reading`
+(a `__slots__` record for single readings) or a row of a NumPy structured
+array with reading_dtype() (for batches). Consumers then read plain
+attributes or columns instead of repeating nested key lookups and
+catching KeyError/TypeError per record. Malformed readings are counted,
+never raised.
+
+Measured with tracemalloc on a simulator payload, a Reading takes about
+290 B (its site name and fault code are interned and shared), against
+about 1.7 kB for the decoded dict. A batch row takes 88 B.
+
+Time is carried as `ts_ms`, an integer UTC epoch-millisecond timestamp,
+so range queries and interval arithmetic are integer operations. Legacy
+readings that only have the simulator's local ISO `timestamp` string are
+converted once, when they are parsed.
+"""
+import json
+import sys
+from datetime import datetime
+
+# Numeric fields shared by Reading and the batch dtype, in column order.
+NUMERIC_FIELDS = ('solar_kw', 'wind_kw', 'total_kw', 'consumption_kw', 'battery_soc_percent', 'net_power_kw')
+SOURCE_BYTES = 32 # Width of the batch 'source' column; longer site names are truncated
+MIN_TS_MS = 946_684_800_000 # 2000-01-01 UTC; anything outside these bounds is a corrupt timestamp
+MAX_TS_MS = 4_102_444_800_000 # 2100-01-01 UTC
+
+_reading_dtype = None
+
+
+def reading_dtype():
+    """Returns the NumPy structured dtype for a batch of readings: 8 bytes per
+    numeric field plus the UTF-8 encoded source, so metrics can be kept per site."""
+    global _reading_dtype
+    if _reading_dtype is None:
+        import numpy as np
+        _reading_dtype = np.dtype([('ts_ms', 'i8')] + [(name, 'f8') for name in NUMERIC_FIELDS]
+                                  + [('source', f'S{SOURCE_BYTES}')])
+    return _reading_dtype
+
+
+def _number(value):
+    # bool is an int subclass but never a valid measurement.
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError(f"expected a number, got {type(value).__name__}")
+    return float(value)
+
+
+def epoch_ms(timestamp):
+    """Converts an ISO timestamp to UTC epoch ms. Naive timestamps are local time,
+    which is how the simulator has always written them."""
+    return int(datetime.fromisoformat(timestamp).timestamp() * 1000)
+
+
+def iso_timestamp(ts_ms):
+    """Converts UTC epoch ms back to the local ISO string shown on the dashboard."""
+    return datetime.fromtimestamp(ts_ms / 1000).isoformat()
+
+
+def _source(data):
+    return str(data.get('source') or 'unknown')
+
+
+def _timestamp_ms(data, arrival_ms=None):
+    ts_ms = data.get('ts_ms')
+    if not isinstance(ts_ms, int) or isinstance(ts_ms, bool):
+        timestamp = data.get('timestamp')
+        if timestamp is None and arrival_ms is not None:
+            ts_ms = arrival_ms
+        elif isinstance(timestamp, str):
+            ts_ms = epoch_ms(timestamp)
+        else:
+            raise TypeError("reading has no usable timestamp")
+    # Out-of-range values would overflow the i8 column or fail when formatted back to ISO.
+    if not MIN_TS_MS <= ts_ms <= MAX_TS_MS:
+        raise ValueError(f"timestamp {ts_ms} ms is out of range")
+    return ts_ms
+
+
+def _validated(data, arrival_ms=None):
+    """One pass over a raw reading dict. Returns the field values or raises."""
+    generation = data['generation']
+    grid_status = data.get('grid_status') or {}
+    total_kw = _number(generation['total_kw'])
+    consumption_kw = _number(data['consumption_kw'])
+    net_power_kw = grid_status.get('net_power_kw')
+    return (
+        _timestamp_ms(data, arrival_ms),
+        _number(generation.get('solar_kw', 0)),
+        _number(generation.get('wind_kw', 0)),
+        total_kw,
+        consumption_kw,
+        _number(data['battery_soc_percent']),
+        total_kw - consumption_kw if net_power_kw is None else _number(net_power_kw),
+    )
+
+
+class Reading:
+    """One validated reading."""
+
+    __slots__ = ('source', 'ts_ms', 'seq') + NUMERIC_FIELDS + ('fault',)
+
+    def __init__(self, source, ts_ms, solar_kw, wind_kw, total_kw, consumption_kw,
+                 battery_soc_percent, net_power_kw, fault="None", seq=None):
+        self.source = source
+        self.ts_ms = ts_ms
+        self.seq = seq # Per-site sequence number, assigned by the listener at ingest
+        self.solar_kw = solar_kw
+        self.wind_kw = wind_kw
+        self.total_kw = total_kw
+        self.consumption_kw = consumption_kw
+        self.battery_soc_percent = battery_soc_percent
+        self.net_power_kw = net_power_kw
+        self.fault = fault
+
+    @property
+    def timestamp(self):
+        return iso_timestamp(self.ts_ms)
+
+    def to_dict(self):
+        """Returns the nested wire format stored in Firebase and shown on the dashboard."""
+        return {
+            'source': self.source,
+            'generation': {'solar_kw': self.solar_kw, 'wind_kw': self.wind_kw, 'total_kw': self.total_kw},
+            'battery_soc_percent': self.battery_soc_percent,
+            'consumption_kw': self.consumption_kw,
+            'grid_status': {'fault': self.fault, 'net_power_kw': self.net_power_kw},
+            'timestamp': self.timestamp,
+            'ts_ms': self.ts_ms,
+            'seq': self.seq,
+        }
+
+
+def parse_reading(data, arrival_ms=None):
+    """Validates a raw reading dict into a Reading, or returns None if it is malformed.
+
+    A reading without any timestamp is stamped with `arrival_ms` when given.
+    """
+    try:
+        values = _validated(data, arrival_ms)
+        fault = (data.get('grid_status') or {}).get('fault', "None")
+        seq = data.get('seq')
+        # Site names and fault codes repeat on every reading, so all instances share one string.
+        return Reading(sys.intern(_source(data)), *values, fault=sys.intern(str(fault)),
+                       seq=seq if isinstance(seq, int) else None)
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+
+
+def parse_payload(payload, arrival_ms=None):
+    """Decodes an MQTT payload (bytes) and validates it, or returns None if it is malformed."""
+    try:
+        data = json.loads(payload)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return parse_reading(data, arrival_ms) if isinstance(data, dict) else None
+
+
+def parse_batch(records):
+    """Validates raw reading dicts into a reading_dtype() array in one pass.
+
+    Returns (array, malformed_count). Malformed records are skipped.
+    """
+    import numpy as np
+
+    rows = []
+    malformed = 0
+    for data in records:
+        try:
+            rows.append(_validated(data) + (_source(data).encode('utf-8')[:SOURCE_BYTES],))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            malformed += 1
+    return np.array(rows, dtype=reading_dtype()), malformed
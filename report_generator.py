@@ -1,80 +1,34 @@
-import firebase_admin
-from firebase_admin import credentials, db
 from datetime import datetime
-from fpdf import FPDF
 import os
-# --- SECURE CONFIGURATION BLOCK (for all Python files) ---
-from dotenv import load_dotenv
-import firebase_admin
-import json
 
-# Load variables from the .env file in the root directory
-load_dotenv()
+from history_reader import DEFAULT_PAGE_SIZE
+from partitioned_aggregation import compute_totals
+from profiling import phase
+from secure_config import get_reference
 
-# Securely load Firebase credentials from the environment variable
-firebase_service_account_json_string = os.getenv('FIREBASE_SERVICE_ACCOUNT_JSON_STRING')
-if not firebase_service_account_json_string:
-    raise ValueError("Firebase credentials are not set in the .env file.")
+# --- 1. CONFIGURATION ---
+FIREBASE_APP_NAME = 'reportGeneratorApp'
 
-# Convert the single-line JSON string back into a Python dictionary
-service_account_info = json.loads(firebase_service_account_json_string)
-credential = credentials.Certificate(service_account_info)
-
-# Securely load the database URL
-database_url = os.getenv('FIREBASE_DATABASE_URL')
-if not database_url:
-    raise ValueError("Firebase database URL is not set in the .env file.")
-
-# --- 2. INITIALIZE FIREBASE ---
-try:
-    print("Initializing Firebase for Report Generation...")
-    app = firebase_admin.initialize_app(
-        credential,
-        {'databaseURL': database_url},
-        name='reportGeneratorApp'
-    )
-    print("   -> Firebase Initialized.")
-except Exception as e:
-    if 'has already been initialized' in str(e):
-        app = firebase_admin.get_app(name='reportGeneratorApp')
-    else:
-        print(f"   -> CRITICAL ERROR: {e}")
-        exit()
-
-# --- 3. REPORT GENERATION LOGIC ---
-def generate_report():
+# --- 2. REPORT GENERATION LOGIC ---
+def generate_report(page_size=DEFAULT_PAGE_SIZE, workers=0, use_cache=True):
     print("\n--- Starting On-Demand Report Generation ---")
     
-    # A. Fetch all historical data
-    print("Fetching all historical data from Firebase...")
-    live_data_ref = db.reference('live_data', app=app)
-    historical_data = live_data_ref.get()
-    
-    if not historical_data or len(historical_data) < 100:
+    # A. Stream all historical data and B. calculate key metrics page by page
+    print("Streaming all historical data from Firebase...")
+    live_data_ref = get_reference('live_data', FIREBASE_APP_NAME)
+    totals = compute_totals(live_data_ref, page_size=page_size, workers=workers, use_cache=use_cache)
+
+    if totals.readings < 100:
         print("   -> Not enough data for a meaningful report. Run the simulator longer.")
         return
 
-    data_points = list(historical_data.values())
-    print(f"   -> Analyzing {len(data_points)} data points.")
+    print(f"   -> Analyzed {totals.readings} data points.")
+    total_generated_kwh = totals.total_generated_kwh
+    total_consumed_kwh = totals.total_consumed_kwh
+    wasted_overflow_kwh = totals.wasted_overflow_kwh
+    underflow_events = totals.underflow_events
 
-    # B. Calculate Key Metrics
-    total_generated_kwh = 0
-    total_consumed_kwh = 0
-    wasted_overflow_kwh = 0
-    underflow_events = 0
-    energy_per_interval_kwh = 5 / 3600.0
-
-    for point in data_points:
-        total_generated_kwh += point['generation']['total_kw'] * energy_per_interval_kwh
-        total_consumed_kwh += point['consumption_kw'] * energy_per_interval_kwh
-        
-        net_power = point['generation']['total_kw'] - point['consumption_kw']
-        if net_power > 0 and point['battery_soc_percent'] >= 99.5:
-            wasted_overflow_kwh += net_power * energy_per_interval_kwh
-        if net_power < 0 and point['battery_soc_percent'] <= 0.5:
-            underflow_events += 1
-
-    downtime_avoided_minutes = (underflow_events * 5) / 60
+    downtime_avoided_minutes = totals.underflow_seconds / 60
     baseline_efficiency = (total_consumed_kwh / total_generated_kwh * 100) if total_generated_kwh > 0 else 0
     optimized_consumed_kwh = total_consumed_kwh + wasted_overflow_kwh
     optimized_efficiency = (optimized_consumed_kwh / total_generated_kwh * 100) if total_generated_kwh > 0 else 0
@@ -95,15 +49,17 @@ def generate_report():
         'baseline_efficiency_percent': round(baseline_efficiency, 2),
         'optimized_efficiency_percent': round(optimized_efficiency, 2),
         'recommendation': recommendation,
-        'data_points_analyzed': len(data_points)
+        'data_points_analyzed': totals.readings
     }
 
     # E. Save JSON report to Firebase
-    report_ref = db.reference('reports/latest', app=app)
-    report_ref.set(report_data)
+    with phase('write'):
+        report_ref = get_reference('reports/latest', FIREBASE_APP_NAME)
+        report_ref.set(report_data)
     print("✅ JSON report saved to Firebase under /reports/latest.")
     
     # F. Generate and save PDF report
+    from fpdf import FPDF
     pdf = FPDF()
     pdf.add_page()
     pdf.set_font("Arial", 'B', 16)
@@ -122,9 +78,18 @@ def generate_report():
     if not os.path.exists('reports'):
         os.makedirs('reports')
     pdf_filename = 'reports/latest_report.pdf'
-    pdf.output(pdf_filename)
+    with phase('write'):
+        pdf.output(pdf_filename)
     print(f"✅ PDF report saved locally as '{pdf_filename}'.")
 
-# --- 4. RUN THE SCRIPT ---
+# --- 3. RUN THE SCRIPT ---
+def main(args=None):
+    generate_report(
+        page_size=getattr(args, 'page_size', DEFAULT_PAGE_SIZE),
+        workers=getattr(args, 'workers', 0),
+        use_cache=not getattr(args, 'no_cache', False),
+    )
+
+
 if __name__ == "__main__":
-    generate_report()
\ No newline at end of file
+    main()
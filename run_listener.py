@@ -1,84 +1,139 @@
 import json
-import paho.mqtt.client as mqtt
-import firebase_admin
-from firebase_admin import credentials, db
 import time
-import os
-from dotenv import load_dotenv
-load_dotenv()
-
-# Securely load Firebase credentials from the environment variable
-firebase_service_account_json_string = os.getenv('FIREBASE_SERVICE_ACCOUNT_JSON_STRING')
-if not firebase_service_account_json_string:
-    raise ValueError("Firebase credentials are not set in the .env file.")
-
-# Convert the single-line JSON string back into a Python dictionary
-service_account_info = json.loads(firebase_service_account_json_string)
-credential = credentials.Certificate(service_account_info)
-
-# Securely load the database URL
-database_url = os.getenv('FIREBASE_DATABASE_URL')
-if not database_url:
-    raise ValueError("Firebase database URL is not set in the .env file.")
 
+from dashboard_views import DASHBOARD_NODE, RECENT_READINGS_LIMIT, DashboardView, DashboardWriter
+from history_reader import iter_range_pages
+from profiling import phase
+from reading_schema import parse_payload
+from secure_config import get_reference
 
 # --- CONFIGURATION ---
 # These are the settings from our successful test.
 MQTT_BROKER_ADDRESS = "test.mosquitto.org"
+MQTT_PORT = 1883
 MQTT_TOPIC_TO_SUBSCRIBE = "smartgrid/data"
+FIREBASE_APP_NAME = 'myFinalListenerApp'
+LIVE_DATA_NODE = 'live_data'
+DASHBOARD_WRITE_INTERVAL_SECONDS = 2 # Coalesce bursts of readings into one write
+CATCH_UP_MARGIN_MS = 60_000 # Readings can be stored a little out of ts_ms order across sites
 # --- END OF CONFIGURATION ---
 
-# --- 2. INITIALIZE FIREBASE (FINAL CORRECTED VERSION) ---
-try:
-    print("STEP 1: Initializing Firebase...")
-    # CHANGE #1: We capture the initialized app in a variable called 'app'.
-    app = firebase_admin.initialize_app(
-        credential,
-        {'databaseURL': database_url},
-        name='myFinalListenerApp'
-    )
-    
-    # CHANGE #2: We explicitly tell db.reference() to use our named 'app'.
-    firebase_db_ref = db.reference('live_data', app=app)
-    
-    print("   -> SUCCESS: Firebase initialized and database reference created.")
-
-except Exception as e:
-    print(f"\n   -> ❌ CRITICAL ERROR: Firebase initialization failed.")
-    print(f"      The specific error is: {e}\n")
-    exit()
-
 
 # --- MQTT Functions ---
 def on_mqtt_connect(client, userdata, flags, rc):
     if rc == 0:
         print("STEP 2: Connected to MQTT Broker!")
-        client.subscribe(MQTT_TOPIC_TO_SUBSCRIBE)
-        print(f"   -> Subscribed to topic: '{MQTT_TOPIC_TO_SUBSCRIBE}'")
+        client.subscribe(userdata['topic'])
+        print(f"   -> Subscribed to topic: '{userdata['topic']}'")
     else:
         print(f"   -> ❌ ERROR: Failed to connect to MQTT Broker. Code: {rc}")
 
 def on_mqtt_message(client, userdata, msg):
     print(f"   -> Message received on '{msg.topic}'...")
     try:
-        payload_string = msg.payload.decode('utf-8')
-        data_dict = json.loads(payload_string)
-        firebase_db_ref.push(data_dict)
+        # Validate once at ingest; everything downstream can trust the stored shape.
+        # Every stored reading gets an integer UTC epoch-ms 'ts_ms' and a per-site 'seq'.
+        arrival_ms = time.time_ns() // 1_000_000
+        with phase('parse'):
+            reading = parse_payload(msg.payload, arrival_ms)
+        dashboard_writer = userdata['dashboard_writer']
+        # The writer's timer flushes from another thread, so change the view under its lock.
+        with dashboard_writer.lock:
+            if reading is None:
+                print("      -> Skipped malformed reading.")
+                userdata['dashboard_view'].count_malformed()
+            else:
+                userdata['dashboard_view'].assign_sequence(reading)
+                with phase('write'):
+                    userdata['live_data_ref'].push(reading.to_dict())
+                with phase('compute'):
+                    userdata['dashboard_view'].ingest(reading)
+            with phase('write'):
+                dashboard_writer.maybe_write()
     except Exception as e:
         print(f"      -> ERROR processing message: {e}")
 
 # --- Main Script Logic ---
-mqtt_client = mqtt.Client()
-mqtt_client.on_connect = on_mqtt_connect
-mqtt_client.on_message = on_mqtt_message
-
-try:
-    print("\nSTEP 3: Connecting to MQTT Broker...")
-    mqtt_client.connect(MQTT_BROKER_ADDRESS)
-    print("   -> Listener is now running. Press CTRL+C to stop.")
-    mqtt_client.loop_forever()
-except KeyboardInterrupt:
-    print("\nScript stopped by user.")
-    mqtt_client.disconnect()
-except Exception as e:
-    print(f"\n   -> ❌ CRITICAL ERROR: Could not connect to MQTT. Error: {e}")
\ No newline at end of file
+def load_dashboard_view(dashboard_ref, live_data_ref, dashboard_file=None):
+    """Restores the materialized view so a restart keeps the KPIs and recent readings."""
+    view = None
+    if dashboard_file:
+        try:
+            with open(dashboard_file, encoding='utf-8') as f:
+                view = DashboardView.from_document(json.load(f))
+        except (OSError, ValueError):
+            pass
+    if view is None:
+        view = DashboardView.from_document(dashboard_ref.get())
+
+    # The document may predate the last stored readings (e.g. after a crash), so
+    # catch up from 'live_data' to continue every site's sequence where it stopped.
+    # Only readings stored after the document's newest reading can be missing, so
+    # the read is bounded by how stale the document is, not by the oldest site.
+    if view.latest_by_site:
+        start_ms = max(reading.ts_ms for reading in view.latest_by_site.values()) - CATCH_UP_MARGIN_MS
+        for items in iter_range_pages(live_data_ref, start_ms):
+            view.catch_up(reading for _, reading in items)
+    else:
+        recent = live_data_ref.order_by_child('ts_ms').limit_to_last(RECENT_READINGS_LIMIT).get()
+        view.catch_up((recent or {}).values())
+    return view
+
+def run_listener(dashboard_file=None, dashboard_interval=DASHBOARD_WRITE_INTERVAL_SECONDS,
+                 broker=MQTT_BROKER_ADDRESS, port=MQTT_PORT, topic=MQTT_TOPIC_TO_SUBSCRIBE,
+                 live_data_node=LIVE_DATA_NODE, dashboard_node=DASHBOARD_NODE):
+    """Connects to Firebase and MQTT, then stores every reading received
+    and keeps the materialized dashboard view up to date.
+
+    The broker, topic and nodes can be changed so a replayed capture is
+    stored apart from the production history and dashboard."""
+    import paho.mqtt.client as mqtt
+
+    try:
+        print("STEP 1: Initializing Firebase...")
+        firebase_db_ref = get_reference(live_data_node, FIREBASE_APP_NAME)
+        dashboard_ref = get_reference(dashboard_node, FIREBASE_APP_NAME)
+        dashboard_view = load_dashboard_view(dashboard_ref, firebase_db_ref, dashboard_file)
+        print("   -> SUCCESS: Firebase initialized and database reference created.")
+    except Exception as e:
+        print(f"\n   -> ❌ CRITICAL ERROR: Firebase initialization failed.")
+        print(f"      The specific error is: {e}\n")
+        return
+
+    dashboard_writer = DashboardWriter(dashboard_view, dashboard_ref, dashboard_file, dashboard_interval)
+    mqtt_client = mqtt.Client(userdata={
+        'live_data_ref': firebase_db_ref,
+        'dashboard_view': dashboard_view,
+        'dashboard_writer': dashboard_writer,
+        'topic': topic,
+    })
+    mqtt_client.on_connect = on_mqtt_connect
+    mqtt_client.on_message = on_mqtt_message
+
+    try:
+        print("\nSTEP 3: Connecting to MQTT Broker...")
+        mqtt_client.connect(broker, port)
+        print("   -> Listener is now running. Press CTRL+C to stop.")
+        mqtt_client.loop_forever()
+    except KeyboardInterrupt:
+        print("\nScript stopped by user.")
+        dashboard_writer.write()
+        mqtt_client.disconnect()
+    except Exception as e:
+        print(f"\n   -> ❌ CRITICAL ERROR: Could not connect to MQTT. Error: {e}")
+
+
+def main(args=None):
+    run_listener(
+        dashboard_file=getattr(args, 'dashboard_file', None),
+        dashboard_interval=getattr(args, 'dashboard_interval', DASHBOARD_WRITE_INTERVAL_SECONDS),
+        broker=getattr(args, 'broker', MQTT_BROKER_ADDRESS),
+        port=getattr(args, 'port', MQTT_PORT),
+        topic=getattr(args, 'topic', MQTT_TOPIC_TO_SUBSCRIBE),
+        live_data_node=getattr(args, 'live_data_node', LIVE_DATA_NODE),
+        dashboard_node=getattr(args, 'dashboard_node', DASHBOARD_NODE),
+    )
+
+
+if __name__ == "__main__":
+    main()
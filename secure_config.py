@@ -0,0 +1,55 @@
+# --- SECURE CONFIGURATION BLOCK (shared by all Python files) ---
+# Nothing in this module touches the network or imports firebase_admin at
+# import time. Credentials are read and the Firebase app is created the first
+# time a command actually asks for it.
+import os
+import json
+
+_apps = {}
+
+
+def load_environment():
+    """Loads variables from the .env file in the root directory (once)."""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+def get_firebase_app(name):
+    """Returns the named Firebase app, initializing it on first use."""
+    if name in _apps:
+        return _apps[name]
+
+    import firebase_admin
+    from firebase_admin import credentials
+
+    load_environment()
+
+    # Securely load Firebase credentials from the environment variable
+    firebase_service_account_json_string = os.getenv('FIREBASE_SERVICE_ACCOUNT_JSON_STRING')
+    if not firebase_service_account_json_string:
+        raise ValueError("Firebase credentials are not set in the .env file.")
+
+    # Convert the single-line JSON string back into a Python dictionary
+    service_account_info = json.loads(firebase_service_account_json_string)
+    credential = credentials.Certificate(service_account_info)
+
+    # Securely load the database URL
+    database_url = os.getenv('FIREBASE_DATABASE_URL')
+    if not database_url:
+        raise ValueError("Firebase database URL is not set in the .env file.")
+
+    try:
+        app = firebase_admin.initialize_app(credential, {'databaseURL': database_url}, name=name)
+    except ValueError:
+        # This can happen if the app is already initialized in another script
+        # running in the same process. We reuse the existing app.
+        app = firebase_admin.get_app(name=name)
+
+    _apps[name] = app
+    return app
+
+
+def get_reference(path, app_name):
+    """Returns a database reference bound to the named Firebase app."""
+    from firebase_admin import db
+    return db.reference(path, app=get_firebase_app(app_name))
@@ -0,0 +1,127 @@
+"""In-memory stand-ins for Firebase references and raw readings."""
+from collections import OrderedDict
+
+
+def _rank(value):
+    # Firebase orders children by type first: null, booleans, numbers, strings, objects.
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    return (4, 0)
+
+
+class FakeQuery:
+    """The subset of firebase_admin.db.Query the jobs use, over an in-memory dict."""
+
+    def __init__(self, data, child=None, start=None, end=None, first=None, last=None):
+        self.data = data
+        self.child = child
+        self.start = start
+        self.end = end
+        self.first = first
+        self.last = last
+
+    def _with(self, **changes):
+        fields = dict(child=self.child, start=self.start, end=self.end, first=self.first, last=self.last)
+        fields.update(changes)
+        return FakeQuery(self.data, **fields)
+
+    def start_at(self, value):
+        return self._with(start=value)
+
+    def end_at(self, value):
+        return self._with(end=value)
+
+    def limit_to_first(self, count):
+        return self._with(first=count)
+
+    def limit_to_last(self, count):
+        return self._with(last=count)
+
+    def _order(self, key):
+        if self.child is None:
+            return key
+        reading = self.data[key]
+        return _rank(reading.get(self.child) if isinstance(reading, dict) else None)
+
+    def get(self):
+        keys = sorted(self.data, key=lambda key: (self._order(key), key))
+        bound = (lambda value: value) if self.child is None else _rank
+        if self.start is not None:
+            keys = [key for key in keys if self._order(key) >= bound(self.start)]
+        if self.end is not None:
+            keys = [key for key in keys if self._order(key) <= bound(self.end)]
+        if self.first is not None:
+            keys = keys[:self.first]
+        if self.last is not None:
+            keys = keys[-self.last:]
+        return OrderedDict((key, self.data[key]) for key in keys) or None
+
+
+class FakeReference:
+    def __init__(self, data):
+        self.data = data
+
+    def order_by_key(self):
+        return FakeQuery(self.data)
+
+    def order_by_child(self, child):
+        return FakeQuery(self.data, child)
+
+    def update(self, values):
+        """Multi-path update: keys are '<child key>/<field>' paths."""
+        for path, value in values.items():
+            key, field = path.split('/', 1)
+            self.data[key][field] = value
+
+
+def make_reading(source, ts_ms, total_kw=2.0, consumption_kw=1.0, soc=50.0):
+    return {
+        'source': source,
+        'generation': {'solar_kw': total_kw, 'wind_kw': 0.0, 'total_kw': total_kw},
+        'consumption_kw': consumption_kw,
+        'battery_soc_percent': soc,
+        'grid_status': {'fault': "None", 'net_power_kw': total_kw - consumption_kw},
+        'ts_ms': ts_ms,
+    }
+
+
+class FakeNode:
+    """A write-side stand-in for one path of a FakeDatabase."""
+
+    def __init__(self, database, path):
+        self.database = database
+        self.path = path
+
+    def get(self):
+        return self.database.values.get(self.path)
+
+    def set(self, value):
+        self.database.values[self.path] = value
+
+    def update(self, values):
+        current = dict(self.get() or {})
+        current.update(values)
+        self.set(current)
+
+    def push(self, value):
+        self.database.pushed.setdefault(self.path, []).append(value)
+
+    def transaction(self, update):
+        self.set(update(self.get()))
+
+
+class FakeDatabase:
+    """Stores whole values per path; `get_reference` mirrors secure_config.get_reference."""
+
+    def __init__(self):
+        self.values = {}
+        self.pushed = {}
+
+    def get_reference(self, path, app_name=None):
+        return FakeNode(self, path)
@@ -0,0 +1,22 @@
+from cli import build_parser
+
+
+def test_replay_defaults_to_a_local_broker_and_a_separate_topic():
+    args = build_parser().parse_args(['replay', 'stream.cap'])
+
+    assert (args.broker, args.port, args.topic, args.recorded_topic) == ('localhost', 1883, 'smartgrid/replay', False)
+
+
+def test_listen_can_follow_a_replay_into_separate_nodes():
+    args = build_parser().parse_args(['listen', '--broker', 'localhost', '--topic', 'smartgrid/replay',
+                                      '--live-data-node', 'replay/live_data', '--dashboard-node', 'replay/dashboard'])
+
+    assert (args.broker, args.port, args.topic) == ('localhost', 1883, 'smartgrid/replay')
+    assert (args.live_data_node, args.dashboard_node) == ('replay/live_data', 'replay/dashboard')
+
+
+def test_listen_defaults_to_production():
+    args = build_parser().parse_args(['listen'])
+
+    assert (args.broker, args.topic, args.live_data_node, args.dashboard_node) == (
+        'test.mosquitto.org', 'smartgrid/data', 'live_data', 'dashboard')
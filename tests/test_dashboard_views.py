@@ -0,0 +1,123 @@
+import time
+
+import dashboard_views
+import fakes
+from dashboard_views import RECENT_ALERTS_LIMIT, DashboardView, DashboardWriter, push_alert
+from fakes import FakeDatabase, FakeReference, make_reading
+from reading_schema import parse_reading
+from run_listener import load_dashboard_view
+
+BASE_MS = 1_760_000_000_000
+
+
+class DocumentReference:
+    def __init__(self, document):
+        self.document = document
+
+    def get(self):
+        return self.document
+
+
+def stored_reading(source, ts_ms, seq):
+    reading = make_reading(source, ts_ms)
+    reading['seq'] = seq
+    return reading
+
+
+def next_seq(view, source, ts_ms):
+    reading = parse_reading(make_reading(source, ts_ms))
+    return view.assign_sequence(reading).seq
+
+
+def test_seq_continues_from_readings_stored_after_the_document():
+    view = DashboardView()
+    for seq in range(3):
+        view.ingest(parse_reading(stored_reading('site_a', BASE_MS + seq * 5000, seq)))
+    document = view.to_document()
+    # The listener crashed after storing three more readings and a new site.
+    live_data = {f"a{seq}": stored_reading('site_a', BASE_MS + seq * 5000, seq) for seq in range(6)}
+    live_data['b0'] = stored_reading('site_b', BASE_MS + 26_000, 0)
+
+    restored = load_dashboard_view(DocumentReference(document), FakeReference(live_data))
+
+    assert next_seq(restored, 'site_a', BASE_MS + 30_000) == 6
+    assert next_seq(restored, 'site_b', BASE_MS + 30_000) == 1
+
+
+def test_catch_up_does_not_read_back_to_a_site_that_went_quiet(monkeypatch):
+    quiet_since_ms = BASE_MS
+    now_ms = BASE_MS + 90 * 86_400_000
+    view = DashboardView()
+    view.ingest(parse_reading(stored_reading('retired', quiet_since_ms, 41)))
+    view.ingest(parse_reading(stored_reading('site_a', now_ms, 7)))
+    live_data = {'retired': stored_reading('retired', quiet_since_ms, 41)}
+    live_data.update({f"a{seq}": stored_reading('site_a', now_ms - 8 + seq, seq) for seq in range(9)})
+    keys_read = []
+    fake_get = fakes.FakeQuery.get
+    def recording_get(query):
+        page = fake_get(query)
+        keys_read.extend(page or ())
+        return page
+    monkeypatch.setattr(fakes.FakeQuery, 'get', recording_get)
+
+    restored = load_dashboard_view(DocumentReference(view.to_document()), FakeReference(live_data))
+
+    assert next_seq(restored, 'site_a', now_ms + 5000) == 9
+    assert next_seq(restored, 'retired', now_ms + 5000) == 42
+    assert 'retired' not in keys_read
+
+
+def test_catch_up_without_a_document_reads_the_latest_readings():
+    live_data = {f"a{seq}": stored_reading('site_a', BASE_MS + seq * 5000, seq) for seq in range(4)}
+
+    restored = load_dashboard_view(DocumentReference(None), FakeReference(live_data))
+
+    assert next_seq(restored, 'site_a', BASE_MS + 60_000) == 4
+
+
+def test_writer_flushes_changes_made_inside_the_interval():
+    database = FakeDatabase()
+    view = DashboardView()
+    writer = DashboardWriter(view, database.get_reference('dashboard'), min_interval_seconds=0.2)
+    try:
+        for index in range(5):
+            with writer.lock:
+                view.ingest(parse_reading(make_reading('site_a', BASE_MS + index * 5000)))
+                writer.maybe_write()
+        assert database.values['dashboard']['kpis']['readings_ingested'] == 1
+
+        with writer.lock:
+            view.count_malformed()
+            writer.maybe_write()
+        time.sleep(0.5)
+
+        kpis = database.values['dashboard']['kpis']
+        assert (kpis['readings_ingested'], kpis['malformed_readings']) == (5, 1)
+    finally:
+        writer.write()
+
+
+def test_writer_keeps_the_batch_job_results_in_the_document(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(dashboard_views, 'get_reference', database.get_reference)
+    view = DashboardView()
+    view.ingest(parse_reading(make_reading('site_a', BASE_MS)))
+    writer = DashboardWriter(view, database.get_reference('dashboard'))
+    database.values['dashboard'] = {'efficiency_proof': {'improvement_percent': 12.5}}
+
+    writer.write()
+
+    assert database.values['dashboard']['efficiency_proof'] == {'improvement_percent': 12.5}
+    assert database.values['dashboard']['latest']['source'] == 'site_a'
+
+
+def test_push_alert_keeps_a_bounded_ring_in_the_dashboard(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(dashboard_views, 'get_reference', database.get_reference)
+
+    for index in range(RECENT_ALERTS_LIMIT + 5):
+        push_alert({'timestamp': str(index), 'type': 'Test', 'message': 'm'}, 'testApp')
+
+    assert len(database.pushed['alerts']) == RECENT_ALERTS_LIMIT + 5
+    recent = database.values['dashboard/recent_alerts']
+    assert [alert['timestamp'] for alert in recent] == [str(index) for index in range(5, RECENT_ALERTS_LIMIT + 5)]
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from forecast_selection import backtest_fold, forecast_origins, rank_results
+
+
+def test_origins_leave_training_history_and_a_full_horizon():
+    timestamps_s = np.arange(0, 100 * 3600, 60)
+
+    origins = forecast_origins(timestamps_s, max_horizon_s=24 * 3600, folds=4)
+
+    assert len(origins) == 4
+    assert origins[0] >= timestamps_s[-1] * 0.5
+    assert origins[-1] == pytest.approx(timestamps_s[-1] - 24 * 3600)
+    assert forecast_origins(timestamps_s, max_horizon_s=90 * 3600) == []
+
+
+def test_backtest_trains_on_the_past_only():
+    from sklearn.linear_model import LinearRegression
+
+    timestamps_s = np.arange(0, 48 * 3600, 600)
+    X = (timestamps_s / 3600).reshape(-1, 1)
+    # The target breaks after the origin; a model that saw the future would fit it.
+    origin_s = 24 * 3600
+    y = np.where(timestamps_s <= origin_s, 1.0, 5.0)
+
+    result = backtest_fold('linear', LinearRegression(), 'hours', X, y, timestamps_s, origin_s, [1, 6])
+
+    assert result['mae']['1h'] == pytest.approx(4.0)
+    assert set(result['mae']) == {'1h', '6h'}
+
+
+def test_ranking_averages_folds_and_orders_by_the_longest_horizon():
+    fold_results = [
+        {'candidate': 'a', 'feature_set': 'f', 'origin_s': 1, 'mae': {'1h': 0.1, '24h': 3.0}},
+        {'candidate': 'a', 'feature_set': 'f', 'origin_s': 2, 'mae': {'1h': 0.3, '24h': 1.0}},
+        {'candidate': 'b', 'feature_set': 'f', 'origin_s': 1, 'mae': {'1h': 0.9, '24h': 1.5}},
+        {'candidate': 'c', 'feature_set': 'f', 'origin_s': 1, 'mae': {'1h': 0.5}},
+        None,
+    ]
+
+    leaderboard = rank_results(fold_results, [1, 24])
+
+    assert [(row['rank'], row['candidate']) for row in leaderboard] == [(1, 'b'), (2, 'a'), (3, 'c')]
+    assert leaderboard[1]['mae_kw'] == {'1h': 0.2, '24h': 2.0}
+    assert leaderboard[1]['folds'] == 2
@@ -0,0 +1,93 @@
+import json
+import random
+
+import pytest
+
+from fakes import make_reading
+from grid_metrics import EnergyTotals, interval_hours
+from reading_schema import parse_batch
+
+BASE_MS = 1_760_000_000_000
+
+
+def interleaved_readings(count=100):
+    """Two sites publishing every 5 s, one offset by 1.7 s, with overflow and underflow stretches."""
+    readings = []
+    for index in range(count):
+        soc = 100.0 if index % 10 < 3 else (0.0 if index % 10 > 7 else 50.0)
+        readings.append(make_reading('site_a', BASE_MS + index * 5000, total_kw=2.0, consumption_kw=1.0, soc=soc))
+        readings.append(make_reading('site_b', BASE_MS + index * 5000 + 1700, total_kw=0.5, consumption_kw=1.5, soc=soc))
+    # A gap longer than MAX_INTERVAL_S on one site only.
+    readings.append(make_reading('site_a', BASE_MS + count * 5000 + 120_000))
+    readings, _ = parse_batch(readings)
+    return readings
+
+
+def assert_same_totals(actual, expected):
+    assert actual.readings == expected.readings
+    assert actual.overflow_events == expected.overflow_events
+    assert actual.underflow_events == expected.underflow_events
+    for name in ('total_generated_kwh', 'total_consumed_kwh', 'wasted_overflow_kwh', 'underflow_seconds'):
+        assert getattr(actual, name) == pytest.approx(getattr(expected, name), abs=1e-12)
+
+
+def test_interleaved_sites_integrate_over_their_own_interval():
+    totals = EnergyTotals().add_chunk(interleaved_readings())
+
+    # Each site covers 100 readings x 5 s; the late reading only gets MAX_INTERVAL_S.
+    expected_hours_a = (100 * 5 + 60) / 3600
+    expected_hours_b = 100 * 5 / 3600
+    assert totals.total_generated_kwh == pytest.approx(2.0 * expected_hours_a + 0.5 * expected_hours_b)
+    assert totals.total_consumed_kwh == pytest.approx(1.0 * expected_hours_a + 1.5 * expected_hours_b)
+
+
+def test_many_sites_match_a_per_reading_reference():
+    rng = random.Random(7)
+    raw = []
+    clock_ms = {f"site_{index}": BASE_MS + rng.randrange(5000) for index in range(300)}
+    for _ in range(5000):
+        site = rng.choice(list(clock_ms))
+        clock_ms[site] += rng.choice([1000, 5000, 5000, 90_000])
+        raw.append(make_reading(site, clock_ms[site], total_kw=rng.uniform(0, 3)))
+    readings, _ = parse_batch(raw)
+
+    expected_kwh = 0.0
+    previous_ms = {}
+    for reading in raw:
+        hours = interval_hours(reading['ts_ms'], previous_ms.get(reading['source']))
+        previous_ms[reading['source']] = reading['ts_ms']
+        expected_kwh += reading['generation']['total_kw'] * hours
+
+    split = EnergyTotals().add_chunk(readings[:2345]).merge(EnergyTotals().add_chunk(readings[2345:]))
+    assert EnergyTotals().add_chunk(readings).total_generated_kwh == pytest.approx(expected_kwh)
+    assert split.total_generated_kwh == pytest.approx(expected_kwh)
+
+
+@pytest.mark.parametrize('cuts', [(1,), (37,), (101,), (50, 51, 150)])
+def test_merged_partials_equal_a_single_pass(cuts):
+    readings = interleaved_readings()
+    single_pass = EnergyTotals().add_chunk(readings)
+
+    bounds = (0,) + cuts + (len(readings),)
+    merged = EnergyTotals()
+    for start, end in zip(bounds, bounds[1:]):
+        merged.merge(EnergyTotals().add_chunk(readings[start:end]))
+
+    assert_same_totals(merged, single_pass)
+
+
+def test_partials_survive_the_cache_round_trip():
+    readings = interleaved_readings()
+    single_pass = EnergyTotals().add_chunk(readings)
+
+    merged = EnergyTotals()
+    for part in (readings[:77], readings[77:]):
+        cached = json.loads(json.dumps(EnergyTotals().add_chunk(part).to_dict()))
+        merged.merge(EnergyTotals.from_dict(cached))
+
+    assert_same_totals(merged, single_pass)
+
+
+def test_merge_rejects_different_thresholds():
+    with pytest.raises(ValueError):
+        EnergyTotals(95).merge(EnergyTotals(99.5))
@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+from fakes import FakeReference, make_reading
+from history_reader import iter_history_chunks, iter_range_chunks
+
+BASE_MS = 1_760_000_000_000
+
+
+@pytest.fixture
+def live_data():
+    rng = random.Random(3)
+    data = {}
+    for index in range(500):
+        # Seven readings share every millisecond, so pages often end inside a tie.
+        data[f"k{index:04d}"] = make_reading(f"site_{index % 7}", BASE_MS + (index // 7) * 10)
+    data['corrupt'] = {'ts_ms': BASE_MS + 5000}
+    keys = list(data)
+    rng.shuffle(keys)
+    return FakeReference({key: data[key] for key in keys})
+
+
+@pytest.mark.parametrize('page_size', [1, 3, 7, 10, 64, 1000])
+def test_range_pages_neither_skip_nor_repeat_tied_readings(live_data, page_size):
+    start_ms = BASE_MS + 200
+
+    chunks = list(iter_range_chunks(live_data, start_ms, page_size))
+
+    timestamps = [int(ts_ms) for chunk in chunks for ts_ms in chunk['ts_ms']]
+    expected = sorted(reading['ts_ms'] for reading in live_data.data.values()
+                      if reading['ts_ms'] >= start_ms and 'source' in reading)
+    assert timestamps == expected
+    assert sum(chunk.malformed for chunk in chunks) == 1
+
+
+def test_range_end_bound_is_inclusive(live_data):
+    chunks = list(iter_range_chunks(live_data, BASE_MS, 4, end_ms=BASE_MS + 20))
+
+    assert sorted(int(ts_ms) for chunk in chunks for ts_ms in chunk['ts_ms']) == [BASE_MS] * 7 + [BASE_MS + 10] * 7 + [BASE_MS + 20] * 7
+
+
+@pytest.mark.parametrize('page_size', [1, 99, 500, 501, 5000])
+def test_history_chunks_cover_every_key_once(live_data, page_size):
+    chunks = list(iter_history_chunks(live_data, page_size))
+
+    assert sum(len(chunk) for chunk in chunks) == 500
+    assert sum(chunk.malformed for chunk in chunks) == 1
+    assert [chunk.last_key for chunk in chunks] == sorted(chunk.last_key for chunk in chunks)
@@ -0,0 +1,44 @@
+import os
+
+from mqtt_capture import MAGIC, RECORD_HEADER, CaptureWriter, complete_length, iter_capture
+
+
+def write_capture(path, messages):
+    writer = CaptureWriter(path)
+    for arrival_ns, topic, payload in messages:
+        writer.append(topic, payload, arrival_ns)
+    writer.close()
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'stream.cap')
+    messages = [(1, 'smartgrid/data', b'{"a": 1}'), (2, 'smartgrid/data', b''), (3, 'other', b'x' * 1000)]
+    write_capture(path, messages)
+
+    assert list(iter_capture(path)) == messages
+
+
+def test_truncated_record_is_skipped_then_trimmed_on_append(tmp_path):
+    path = str(tmp_path / 'stream.cap')
+    write_capture(path, [(1, 'smartgrid/data', b'first')])
+    complete_size = os.path.getsize(path)
+    # An interrupted capture: a header and part of the payload of a second record.
+    with open(path, 'ab') as f:
+        f.write(RECORD_HEADER.pack(2, len(b'smartgrid/data'), 100) + b'smartgrid/data' + b'partial')
+
+    assert list(iter_capture(path)) == [(1, 'smartgrid/data', b'first')]
+    assert complete_length(path) == complete_size
+
+    write_capture(path, [(3, 'smartgrid/data', b'third')])
+
+    assert list(iter_capture(path)) == [(1, 'smartgrid/data', b'first'), (3, 'smartgrid/data', b'third')]
+    assert os.path.getsize(path) == complete_size + RECORD_HEADER.size + len(b'smartgrid/data') + len(b'third')
+
+
+def test_empty_capture_has_only_the_header(tmp_path):
+    path = str(tmp_path / 'stream.cap')
+    write_capture(path, [])
+
+    with open(path, 'rb') as f:
+        assert f.read() == MAGIC
+    assert list(iter_capture(path)) == []
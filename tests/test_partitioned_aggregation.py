@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+import partitioned_aggregation
+from fakes import FakeReference, make_reading
+from partitioned_aggregation import aggregate_history, compute_totals
+
+
+class InlinePool(ThreadPoolExecutor):
+    """Runs partitions in threads so they see the stubbed reference."""
+
+    def __init__(self, max_workers=None, mp_context=None):
+        super().__init__(max_workers=max_workers)
+
+
+@pytest.fixture
+def live_data(tmp_path, monkeypatch):
+    # Three days of two interleaved sites, readings spanning midnight, plus legacy rows.
+    start_ms = int(datetime(2026, 3, 1, 23, 0).timestamp() * 1000)
+    data = {}
+    for index in range(2000):
+        ts_ms = start_ms + index * 60_000
+        soc = 100.0 if index % 7 == 0 else (0.0 if index % 11 == 0 else 50.0)
+        data[f"k{index:05d}a"] = make_reading('site_a', ts_ms, total_kw=2.0, consumption_kw=1.0, soc=soc)
+        if index % 3:
+            data[f"k{index:05d}b"] = make_reading('site_b', ts_ms + 20_000, total_kw=0.5, consumption_kw=1.5, soc=soc)
+    data['legacy_bad'] = {'timestamp': 'not a date', 'generation': {'total_kw': 1.0},
+                          'consumption_kw': 1.0, 'battery_soc_percent': 50.0}
+
+    reference = FakeReference(data)
+    monkeypatch.setattr(partitioned_aggregation, 'get_reference', lambda path, app_name=None: reference)
+    monkeypatch.setattr(partitioned_aggregation, 'ProcessPoolExecutor', InlinePool)
+    monkeypatch.setattr(partitioned_aggregation, 'PARTIAL_CACHE_DIR', str(tmp_path / 'partials'))
+    return reference
+
+
+def assert_same_totals(actual, expected):
+    assert actual.readings == expected.readings
+    assert actual.malformed == expected.malformed
+    assert actual.overflow_events == expected.overflow_events
+    assert actual.underflow_events == expected.underflow_events
+    for name in ('total_generated_kwh', 'total_consumed_kwh', 'wasted_overflow_kwh', 'underflow_seconds'):
+        assert getattr(actual, name) == pytest.approx(getattr(expected, name), rel=1e-12)
+
+
+def test_partitioned_totals_equal_streaming(live_data):
+    streaming = compute_totals(live_data, page_size=333)
+    # A page far smaller than a day, so every partition is folded over several pages.
+    partitioned = compute_totals(live_data, page_size=97, workers=2, use_cache=False)
+
+    assert streaming.readings == 2000 + 1333
+    assert streaming.malformed == 1
+    assert_same_totals(partitioned, streaming)
+
+
+def test_cached_partials_give_the_same_totals(live_data, monkeypatch):
+    first = aggregate_history(workers=2)
+
+    computed_days = []
+    compute_partition = partitioned_aggregation.compute_partition
+    def counting_compute_partition(day_iso, *args):
+        computed_days.append(day_iso)
+        return compute_partition(day_iso, *args)
+    monkeypatch.setattr(partitioned_aggregation, 'compute_partition', counting_compute_partition)
+    cached = aggregate_history(workers=2)
+
+    assert computed_days == [] # Every day is in the past, so all of them came from the cache
+    assert_same_totals(cached, first)
+
+
+def test_history_days_skips_readings_without_ts_ms(live_data):
+    days = partitioned_aggregation.history_days(live_data)
+
+    assert [day.isoformat() for day in days] == ['2026-03-01', '2026-03-02', '2026-03-03']
+
+
+def test_partials_are_not_cached_until_backfill_has_run(live_data, monkeypatch):
+    import backfill_timestamps
+    from reading_schema import iso_timestamp
+
+    # Half of the readings predate 'ts_ms' and only carry the ISO timestamp.
+    for key in list(live_data.data)[::2]:
+        reading = live_data.data[key]
+        if 'ts_ms' in reading:
+            reading['timestamp'] = iso_timestamp(reading.pop('ts_ms'))
+    streaming = compute_totals(live_data, page_size=500)
+
+    before_backfill = compute_totals(live_data, workers=2)
+    assert before_backfill.readings < streaming.readings
+
+    monkeypatch.setattr(backfill_timestamps, 'get_reference', lambda path, app_name=None: live_data)
+    backfill_timestamps.backfill_timestamps(page_size=500)
+    after_backfill = compute_totals(live_data, workers=2)
+    from_cache = compute_totals(live_data, workers=2)
+
+    assert_same_totals(after_backfill, streaming)
+    assert_same_totals(from_cache, streaming)
+
+
+def test_days_are_cached_only_after_the_grace_period():
+    day = datetime(2026, 3, 1).date()
+
+    assert not partitioned_aggregation.is_cacheable(day, datetime(2026, 3, 2, 0, 30))
+    assert partitioned_aggregation.is_cacheable(day, datetime(2026, 3, 2, 12, 0))
@@ -0,0 +1,29 @@
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+import pytest
+
+from predictions import local_wall_time
+
+
+@pytest.fixture
+def berlin_time(monkeypatch):
+    monkeypatch.setenv('TZ', 'Europe/Berlin')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def epoch_ms(*utc_fields):
+    return int(datetime(*utc_fields, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def test_local_wall_time_follows_dst_changes_inside_the_window(berlin_time):
+    # Berlin switches from UTC+1 to UTC+2 at 01:00 UTC on 2026-03-29.
+    ts_ms = pd.Series([epoch_ms(2026, 3, 28, 11, 0), epoch_ms(2026, 3, 29, 11, 0), epoch_ms(2026, 3, 29, 0, 59)])
+
+    local = local_wall_time(ts_ms)
+
+    assert list(local.dt.hour) == [12, 13, 1]
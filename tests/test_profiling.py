@@ -0,0 +1,57 @@
+import json
+import os
+import signal
+
+import pytest
+
+import profiling
+from profiling import phase, run_profiled
+
+
+def only_profile_dir(root):
+    (entry,) = os.listdir(root)
+    return os.path.join(root, entry)
+
+
+def test_profile_files_and_phase_timings(tmp_path):
+    def job():
+        with phase('fetch'):
+            pass
+        for _ in range(3):
+            with phase('compute'):
+                payload = [bytearray(1000) for _ in range(2000)]
+        with phase('write'):
+            del payload
+        return 'done'
+
+    assert run_profiled('job', job, output_root=str(tmp_path)) == 'done'
+
+    output_dir = only_profile_dir(tmp_path)
+    assert os.path.basename(output_dir).startswith('job-')
+    assert sorted(os.listdir(output_dir)) == ['cprofile.pstats', 'cprofile.txt', 'phases.json',
+                                              'stacks.folded', 'tracemalloc.txt']
+    with open(os.path.join(output_dir, 'phases.json'), encoding='utf-8') as f:
+        phases = json.load(f)['phases']
+    assert {name: timing['count'] for name, timing in phases.items()} == {'compute': 3, 'fetch': 1, 'write': 1}
+    with open(os.path.join(output_dir, 'tracemalloc.txt'), encoding='utf-8') as f:
+        report = f.read()
+    assert "'compute' phase" in report
+    assert 'importlib' not in report
+
+
+def test_phase_is_a_shared_no_op_without_a_session():
+    assert profiling._session is None
+    assert phase('fetch') is phase('compute')
+
+
+def test_sigterm_still_writes_the_profile(tmp_path):
+    previous_handler = signal.getsignal(signal.SIGTERM)
+
+    def job():
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    with pytest.raises(KeyboardInterrupt):
+        run_profiled('job', job, output_root=str(tmp_path))
+
+    assert os.path.exists(os.path.join(only_profile_dir(tmp_path), 'phases.json'))
+    assert signal.getsignal(signal.SIGTERM) is previous_handler
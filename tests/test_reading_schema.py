@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from fakes import make_reading
+from reading_schema import parse_batch, parse_payload, parse_reading
+
+BASE_MS = 1_760_000_000_000
+
+
+def without(reading, *path):
+    *parents, key = path
+    target = reading
+    for parent in parents:
+        target = target[parent]
+    del target[key]
+    return reading
+
+
+MALFORMED = [
+    pytest.param(without(make_reading('s', BASE_MS), 'generation'), id='no generation'),
+    pytest.param(without(make_reading('s', BASE_MS), 'generation', 'total_kw'), id='no total_kw'),
+    pytest.param(without(make_reading('s', BASE_MS), 'consumption_kw'), id='no consumption'),
+    pytest.param(dict(make_reading('s', BASE_MS), consumption_kw='1.0'), id='string number'),
+    pytest.param(dict(make_reading('s', BASE_MS), battery_soc_percent=True), id='bool number'),
+    pytest.param(dict(make_reading('s', BASE_MS), generation=None), id='null generation'),
+    pytest.param(dict(without(make_reading('s', BASE_MS), 'ts_ms'), timestamp='yesterday'), id='bad timestamp'),
+    pytest.param(without(make_reading('s', BASE_MS), 'ts_ms'), id='no timestamp'),
+    pytest.param(make_reading('s', 2 ** 70), id='ts_ms overflows i8'),
+    pytest.param(make_reading('s', 10 ** 17), id='ts_ms beyond year 9999'),
+    pytest.param(make_reading('s', -1), id='negative ts_ms'),
+]
+
+
+@pytest.mark.parametrize('raw', MALFORMED)
+def test_malformed_readings_are_none(raw):
+    assert parse_reading(raw) is None
+
+
+def test_parse_batch_counts_malformed_rows_instead_of_raising():
+    raw = [make_reading('s', BASE_MS + index) for index in range(5)]
+    raw[1:1] = [param.values[0] for param in MALFORMED]
+
+    readings, malformed = parse_batch(raw)
+
+    assert malformed == len(MALFORMED)
+    assert list(readings['ts_ms']) == [BASE_MS + index for index in range(5)]
+
+
+def test_valid_reading_round_trips_through_the_wire_format():
+    reading = parse_reading(dict(make_reading('site/1', BASE_MS), seq=4))
+
+    assert parse_reading(reading.to_dict()).to_dict() == reading.to_dict()
+    assert (reading.source, reading.seq, reading.net_power_kw) == ('site/1', 4, 1.0)
+
+
+def test_legacy_iso_timestamp_is_converted():
+    legacy = without(make_reading('s', BASE_MS), 'ts_ms')
+    legacy['timestamp'] = parse_reading(make_reading('s', BASE_MS)).timestamp
+
+    assert parse_reading(legacy).ts_ms == BASE_MS
+
+
+def test_payload_without_timestamp_is_stamped_on_arrival():
+    payload = json.dumps(without(make_reading('s', BASE_MS), 'ts_ms')).encode()
+
+    assert parse_payload(payload, arrival_ms=BASE_MS + 7).ts_ms == BASE_MS + 7
+    assert parse_payload(b'{not json') is None
+    assert parse_payload(b'[1, 2]') is None
+    assert parse_payload(b'\xff\xfe') is None
+
+
+def test_source_and_fault_strings_are_shared_between_readings():
+    first, second = (parse_payload(json.dumps(make_reading('site_a', BASE_MS)).encode()) for _ in range(2))
+
+    assert first.source is second.source
+    assert first.fault is second.fault